@@ -1,5 +1,9 @@
 """Test process to run in isolated environments."""
 
+import os
+import shutil
+from pathlib import Path
+
 import nox
 
 
@@ -29,6 +33,53 @@ def test(session):
     session.run("pytest", "--color=yes", "--cov", "--cov-report=html", *test_files)
 
 
+@nox.session(reuse_venv=True)
+def bench(session):
+    """Compare the benchmarks with a base revision and fail on a regression.
+
+    Both revisions are measured in the same run on the same machine, with the
+    benchmarks of the working tree. The base revision defaults to ``main`` and can be
+    set with ``SPHINX_FAVICON_BENCH_BASE``.
+    """
+    session.install(".[test,bench]")
+    base = os.environ.get("SPHINX_FAVICON_BENCH_BASE", "main")
+    tmp = Path(session.create_tmp())
+    storage, worktree = tmp / "benchmarks", tmp / "base"
+    shutil.rmtree(storage, ignore_errors=True)
+    shutil.rmtree(worktree, ignore_errors=True)
+    options = ["tests/benchmarks", "--benchmark-only", f"--benchmark-storage={storage}"]
+
+    git = ["git", "worktree"]
+    session.run(*git, "add", "--detach", str(worktree), base, external=True)
+    try:
+        shutil.copytree("tests", worktree / "tests", dirs_exist_ok=True)
+        with session.chdir(worktree):
+            session.run("pytest", *options, "--benchmark-save=base", *session.posargs)
+    finally:
+        session.run(*git, "remove", "--force", str(worktree), external=True)
+
+    session.run(
+        "pytest",
+        *options,
+        "--benchmark-compare",
+        "--benchmark-compare-fail=median:25%",
+        *session.posargs,
+    )
+
+
+@nox.session(reuse_venv=True)
+def scaling(session):
+    """Run the end-to-end scaling harness on generated sites.
+
+    The page counts can be set with ``SPHINX_FAVICON_SCALING``, for example
+    ``SPHINX_FAVICON_SCALING=1000,10000,100000 nox -s scaling``.
+    """
+    session.install(".[test]")
+    pages = os.environ.get("SPHINX_FAVICON_SCALING", "1000,5000")
+    session.env["SPHINX_FAVICON_SCALING"] = pages
+    session.run("pytest", "tests/benchmarks/test_scaling.py", "-s", *session.posargs)
+
+
 @nox.session(name="mypy", reuse_venv=True)
 def mypy(session):
     """Run the mypy evaluation of the lib."""
@@ -7,19 +7,71 @@ You can define favicons directly in your conf.py, with different rel attributes
 The sphinx-favicon extension gives you more flexibility than the standard favicon.ico supported by Sphinx. It provides a quick and easy way to add the most important favicon formats for different browsers and devices.
 """
 
-from io import BytesIO
+from __future__ import annotations
+
+import html
+import json
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from os import PathLike
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Sequence, Union, cast
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 from urllib.parse import urlparse
 
 import docutils.nodes as nodes
-import imagesize
-import requests
-from requests.exceptions import RequestException
 from sphinx.application import Sphinx
 from sphinx.util import logging
 
+from .fingerprint import _fingerprint_favicons
+from .generate import GENERATED_CACHE, _generate_favicons
+from .images import MAX_HEADER_BYTES, _file_sizes
+from .inline import _inline_svg_favicons
+from .manifest import (
+    BROWSERCONFIG_FILE,
+    MANIFEST_FILE,
+    _browserconfig,
+    _is_essential,
+    _write_manifests,
+)
+from .network import (
+    CACHE_FILE,
+    VENDOR_CACHE,
+    VENDOR_DIR,
+    RemoteSizeCache,
+    _close_session,
+    _configure_http,
+    _guard,
+    _is_offline,
+    _prefetch_remote_sizes,
+    _remote_size,
+    _reset_network_guard,
+    _vendor_remote_favicon,
+)
+from .optimize import OPTIMIZED_CACHE, _optimize_favicons, _optimize_file
+from .patch import (
+    PATCH_STATE,
+    _build_info_hashes,
+    _delimit,
+    _only_favicons_changed,
+    _patch_html_files,
+)
+from .report import _problems, _stats
+
 logger = logging.getLogger(__name__)
 
 # Configuration type accepted for `favicons` in conf.py
@@ -40,57 +92,343 @@ SUPPORTED_MIME_TYPES: Dict[str, str] = {
     "jpg": "image/jpeg",
     "png": "image/png",
     "svg": "image/svg+xml",
+    "webp": "image/webp",
+    "avif": "image/avif",
 }
 "supported mime types of the link tag"
 
 
-SUPPORTED_SIZE_TYPES: List[str] = ["bmp", "gif", "jpeg", "jpg", "png"]
+SUPPORTED_SIZE_TYPES: List[str] = [
+    "avif",
+    "bmp",
+    "gif",
+    "ico",
+    "jpeg",
+    "jpg",
+    "png",
+    "svg",
+    "webp",
+]
 "list of file type that can be used to compute size"
 
+FILES_CACHE: str = "favicons_files.json"
+"name of the cache file of the values derived from the static files in the doctree directory"
+
+
+class StaticFileIndex:
+    """Index of the favicon files found in the ``html_static_path``.
+
+    Each relative path is looked up once per build. Values derived from a file (like
+    its dimensions or its hash) are shared between the builds of the same process,
+    stored in a cache file for the next processes and recomputed only when the
+    modification time or the size of the file changes.
+    """
+
+    _stamped: ClassVar[Dict[Tuple[str, Path], Tuple[Tuple[float, int], Any]]] = {}
+    "values derived from the files, keyed by kind and path, with their stamp"
+
+    def __init__(
+        self,
+        static_path: Sequence[Union[str, PathLike[str]]],
+        confdir: Union[str, PathLike[str]],
+        path: Optional[Path] = None,
+    ) -> None:
+        """Create an empty index and load the cache file of the derived values.
+
+        Args:
+            static_path: The static_path registered in the application
+            confdir: The source directory of the documentation
+            path: The json file storing the derived values, ``None`` to keep them in
+                memory only
+        """
+        self.folders = [Path(confdir) / folder for folder in static_path]
+        self.files: Dict[str, Optional[Path]] = {}
+        self.path = path
+        self.used: Set[Tuple[str, Path]] = set()
+
+        if path is not None and path.is_file():
+            try:
+                entries = json.loads(path.read_text())
+                for kind, files in entries.items():
+                    for file, (mtime, size, value) in files.items():
+                        stamp = (mtime, size)
+                        self._stamped.setdefault((kind, Path(file)), (stamp, value))
+            except (OSError, TypeError, ValueError):
+                logger.debug(f"[sphinx-favicon] cannot read cache file {path}")
+
+    def find(self, link: str) -> Optional[Path]:
+        """Find a file in the static folders.
+
+        Args:
+            link: The path of the file relative to the static folders
+
+        Returns:
+            The path of the file in the first static folder containing it
+        """
+        if link not in self.files:
+            with _stats.stage("static_lookup"):
+                self.files[link] = next(
+                    (f / link for f in self.folders if (f / link).is_file()), None
+                )
 
-def generate_meta(favicon: Dict[str, str]) -> str:
+        return self.files[link]
+
+    def stamped(self, kind: str, path: Path, compute: Callable[[Path], Any]) -> Any:
+        """Get a value derived from a file, computing it only if the file changed.
+
+        Args:
+            kind: The name of the derived value
+            path: The file
+            compute: The function computing the value from the file
+
+        Returns:
+            The derived value
+        """
+        stat = path.stat()
+        stamp = (stat.st_mtime, stat.st_size)
+        cached = self._stamped.get((kind, path))
+        if cached is None or cached[0] != stamp:
+            _stats.count(f"{kind}_cache_miss")
+            with _stats.stage(kind):
+                cached = (stamp, compute(path))
+            self._stamped[(kind, path)] = cached
+        else:
+            _stats.count(f"{kind}_cache_hit")
+        self.used.add((kind, path))
+
+        return cached[1]
+
+    def save(self) -> None:
+        """Write the values derived from the files used in this build to the cache file."""
+        if self.path is None:
+            return
+
+        entries: Dict[str, Dict[str, Any]] = {}
+        for kind, file in sorted(self.used):
+            (mtime, size), value = self._stamped[(kind, file)]
+            entries.setdefault(kind, {})[str(file)] = [mtime, size, value]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(entries, indent=2, sort_keys=True))
+        except OSError:
+            logger.debug(f"[sphinx-favicon] cannot write cache file {self.path}")
+
+    def dimensions(self, path: Path) -> Tuple[int, int]:
+        """Get the dimensions of an image file.
+
+        Args:
+            path: The image file
+
+        Returns:
+            The width and height of the image
+        """
+        import imagesize
+
+        w, h = self.stamped("dimensions", path, imagesize.get)
+        return int(w), int(h)
+
+    def sizes(self, path: Path) -> Optional[str]:
+        """Get the ``sizes`` attribute of an image file.
+
+        Only the beginning of the file is read, the whole file is only parsed when
+        its header does not hold the dimensions (like a JPEG with large metadata).
+
+        Args:
+            path: The image file
+
+        Returns:
+            The ``sizes`` attribute, ``None`` if it cannot be computed
+        """
+        sizes = self.stamped("sizes", path, _file_sizes)
+        if sizes is None:
+            w, h = self.dimensions(path)
+            sizes = f"{w}x{h}" if w > 0 and h > 0 else None
+
+        return sizes
+
+
+@dataclass(frozen=True, slots=True)
+class Favicon:
+    """Favicon compiled from its configuration, ready to be rendered in any page.
+
+    The attributes are escaped once and split around the ``href`` so that a page only
+    needs to insert its own ``href``.
+
+    Attributes:
+        tag: The html tag of the favicon (``link`` or ``meta``)
+        href: The link to the image as set in the configuration
+        is_static: If the ``href`` is a file of the ``html_static_path``
+        extension: The file extension of the ``href``
+        mime_type: The MIME type of the image
+        attributes: The attributes of the tag, in order, with the unresolved ``href``
+        prefix: The escaped attributes placed before the ``href``
+        suffix: The escaped attributes placed after the ``href``
+        fingerprinted: The path of the content-hashed copy of a static file, used in
+            place of the ``href``
+    """
+
+    tag: str
+    href: Optional[str]
+    is_static: bool
+    extension: Optional[str]
+    mime_type: Optional[str]
+    attributes: Tuple[Tuple[str, str], ...]
+    prefix: str
+    suffix: str
+    fingerprinted: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, favicon: Dict[str, str]) -> "Favicon":
+        """Compile the favicon description from the configuration.
+
+        Default behavior:
+        - If favicon data contains no ``rel`` attribute, sets ``rel="icon"``
+        - If no favicon MIME type is provided, the value for ``type`` will be
+          based on the favicon's file name extension (for BMP, GIF, ICO, JPG, JPEG,
+          SVG, or PNG files)
+
+        Args:
+            favicon: Favicon data
+
+        Returns:
+            The compiled favicon
+        """
+        # work on a copy of the favicon (mutable issue)
+        favicon = favicon.copy()
+
+        # get the tag of the output
+        tag = "meta" if "name" in favicon else "link"
+
+        # legacy check for "static-file", it takes precedence over "href"
+        if FILE_FIELD in favicon:
+            favicon["href"] = favicon.pop(FILE_FIELD)
+
+        # default to "icon" for link elements
+        href: Optional[str] = favicon.get("href")
+        extension: Optional[str] = None
+        if tag == "link":
+            favicon.setdefault("rel", "icon")
+            href = favicon["href"]  # to raise an error if not set
+            extension = href.split(".")[-1]
+
+        # set the type for link elements.
+        # if type is not set, try to guess it from the file extension
+        if not favicon.get("type") and extension in SUPPORTED_MIME_TYPES:
+            favicon["type"] = SUPPORTED_MIME_TYPES[cast(str, extension)]
+
+        # check if link is absolute
+        is_static = href is not None and not (
+            bool(urlparse(href).netloc) or href.startswith("/")
+        )
+
+        # pre-render the escaped attributes around the href
+        attributes = tuple((k, v) for k, v in favicon.items() if v is not None)
+        keys = [k for k, _ in attributes]
+        split = keys.index("href") if "href" in keys else len(keys)
+        escaped = [f'{k}="{html.escape(str(v))}"' for k, v in attributes]
+
+        return cls(
+            tag=tag,
+            href=href,
+            is_static=is_static,
+            extension=extension,
+            mime_type=favicon.get("type"),
+            attributes=attributes,
+            prefix="".join(f"{a} " for a in escaped[:split]),
+            suffix="".join(f" {a}" for a in escaped[split + 1 :]),
+        )
+
+
+def generate_meta(
+    favicon: Union[Favicon, Dict[str, str]], href: Optional[str] = None
+) -> str:
     """Generate metatag based on favicon data.
 
-    Default behavior:
-    - If favicon data contains no ``rel`` attribute, sets ``rel="icon"``
-    - If no ``sizes`` attribute is provided, ``sizes`` will be computed from the file
-    - If no favicon MIME type is provided, the value for ``type`` will be
-      based on the favicon's file name extension (for BMP, GIF, ICO, JPG, JPEG,
-      SVG, or PNG files)
+    Favicon data provided as a dict are compiled first (see ``Favicon.from_dict``).
 
     Args:
         favicon: Favicon data
+        href: The ``href`` to use in the tag, default to the one of the favicon
 
     Returns:
         Favicon link or meta tag
     """
-    # get the tag of the output
-    tag = "meta" if "name" in favicon else "link"
+    if isinstance(favicon, dict):
+        favicon = Favicon.from_dict(favicon)
+
+    href = favicon.href if href is None else href
+    if href is None:
+        return f"    <{favicon.tag} {favicon.prefix.rstrip()}>"
 
-    # default to "icon" for link elements
-    if tag == "link":
-        favicon.setdefault("rel", "icon")
-        favicon["href"]  # to raise an error if not set
-        extension = favicon["href"].split(".")[-1]
+    return f'    <{favicon.tag} {favicon.prefix}href="{html.escape(href)}"{favicon.suffix}>'
+
+
+def _vendor_remote_favicons(
+    favicons: List[Dict[str, str]],
+    cache: RemoteSizeCache,
+    root: Path,
+    max_workers: int,
+) -> None:
+    """Replace the remote favicons by vendored copies.
 
-    # set the type for link elements.
-    # if type is not set, try to guess it from the file extension
-    type_ = favicon.get("type")
-    if not type_ and tag == "link" and extension in SUPPORTED_MIME_TYPES:
-        type_ = SUPPORTED_MIME_TYPES[extension]
-        favicon["type"] = type_
+    The favicons are downloaded concurrently. The ``href`` of each downloaded favicon
+    is replaced by the path of its copy relative to ``root``, which is then handled
+    like any other static file.
 
-    # build the html element
-    parameters = [f'{k}="{v}"' for k, v in favicon.items() if v is not None]
-    html_element = f"    <{tag} {' '.join(parameters)}>"
+    Args:
+        favicons: The normalized favicon descriptions, updated in place
+        cache: The persistent cache of remote favicons
+        root: The static folder containing the vendored files
+        max_workers: The maximum number of concurrent requests
+    """
+    links: List[str] = []
+    for favicon in favicons:
+        link = favicon.get(FILE_FIELD) or favicon.get("href")
+        if link and urlparse(link).netloc and link not in links:
+            if link.split(".")[-1] in SUPPORTED_MIME_TYPES:
+                links.append(link)
+
+    folder = root / VENDOR_DIR
+    workers = max(min(max_workers, len(links)), 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        files = executor.map(
+            lambda link: _vendor_remote_favicon(link, cache, folder), links
+        )
+        names = dict(zip(links, files))
+
+    for favicon in favicons:
+        name = names.get(favicon.get(FILE_FIELD) or favicon.get("href") or "")
+        if name is not None:
+            favicon.pop(FILE_FIELD, None)
+            favicon["href"] = f"{VENDOR_DIR}/{name}"
+
+
+def _remote_links(favicons: List[Dict[str, str]]) -> List[str]:
+    """List the remote favicons that need to be fetched to compute their size.
+
+    Args:
+        favicons: The normalized favicon descriptions
+
+    Returns:
+        The unique urls of the remote favicons without ``sizes``
+    """
+    links: List[str] = []
+    for favicon in favicons:
+        link = favicon.get("href") or favicon.get(FILE_FIELD)
+        if not link or favicon.get("sizes") is not None or link in links:
+            continue
+        if link.split(".")[-1] in SUPPORTED_SIZE_TYPES and urlparse(link).netloc:
+            links.append(link)
 
-    return html_element
+    return links
 
 
 def _sizes(
     favicon: Dict[str, str],
     static_path: Sequence[Union[str, PathLike[str]]],
     confdir: Union[str, PathLike[str]],
+    cache: Optional[RemoteSizeCache] = None,
+    index: Optional[StaticFileIndex] = None,
 ) -> Dict[str, str]:
     """Compute the size of the favicon if its size is not explicitly defined.
 
@@ -101,6 +439,8 @@ def _sizes(
         favicon: The favicon description as set in the conf.py file
         static_path: The static_path registered in the application
         confdir: The source directory of the documentation
+        cache: The persistent cache of remote sizes
+        index: The index of the static files
 
     Returns:
         The favicon with a fully qualified size
@@ -116,77 +456,171 @@ def _sizes(
 
     # get the size automatically if not supplied
     if link and sizes is None and extension in SUPPORTED_SIZE_TYPES:
-        file: Optional[Union[BytesIO, Path]] = None
+        file: Optional[Path] = None
         if bool(urlparse(link).netloc):
-            try:
-                response = requests.get(link)
-            except RequestException:
-                response = requests.Response()
-                response.status_code = -1
-
-            if response.status_code == 200:
-                file = BytesIO(response.content)
-            else:
-                logger.warning(
+            remote_size = _remote_size(link, cache)
+            if remote_size is not None:
+                favicon["sizes"] = remote_size
+            elif not _guard.is_skipped(link):
+                _problems.add(
+                    link,
+                    "remote",
                     f"The provided link ({link}) cannot be read. "
-                    "Size will not be computed."
+                    "Size will not be computed.",
                 )
         else:
-            for folder in static_path:
-                path = Path(confdir) / folder / link
-                if path.is_file():
-                    file = path
-                    break
+            index = index or StaticFileIndex(static_path, confdir)
+            file = index.find(link)
             if file is None:
-                logger.warning(
+                _problems.add(
+                    link,
+                    "static",
                     f"The provided path ({link}) is not part of any of the static path. "
-                    "Size will not be computed."
+                    "Size will not be computed.",
                 )
 
         # compute the image size if image file is found
-        if file is not None:
-            w, h = imagesize.get(file)
-            size = f"{int(w)}x{int(h)}"
-            favicon["sizes"] = size
+        if file is not None and index is not None:
+            file_sizes = index.sizes(file)
+            if file_sizes is not None:
+                favicon["sizes"] = file_sizes
 
     return favicon
 
 
-def _static_to_href(pathto: Callable, init_favicon: Dict[str, str]) -> Dict[str, str]:
-    """Replace static ref to fully qualified href.
+def _static_to_href(pathto: Callable, favicon: Favicon) -> Optional[str]:
+    """Get the fully qualified href of a favicon for a page.
 
-    if the ``href`` is a relative path then it's replaced with the correct ``href``. We keep checking for ``static-file`` for legacy reasons.
+    If the ``href`` is a relative path then it's replaced with the correct ``href``. We keep checking for ``static-file`` for legacy reasons.
     If both ``static-file`` and ``href`` are provided, ``href`` will be ignored.
-    If the favicon has no ``href`` nor ``static-file`` then do nothing.
+    If the favicon has no ``href`` nor ``static-file`` then return ``None``.
 
     Args:
         pathto: Sphinx helper_ function to handle relative URLs
-        init_favicon: The favicon description as set in the conf.py file
+        favicon: The compiled favicon
 
     Returns:
-        The favicon with a fully qualified href
+        The fully qualified href of the favicon
     """
-    # work on a copy of the favicon (mutable issue)
-    favicon = init_favicon.copy()
+    # if the link is absolute do nothing, else replace it with a full one
+    if not favicon.is_static:
+        return favicon.href
 
-    # exit if the favicon tag has no href (like meta)
-    if not (FILE_FIELD in favicon or "href" in favicon):
-        return favicon
+    # `pathto` may return a `_StrPath`, cast to `str` for consistent typing
+    href = favicon.fingerprinted or favicon.href
+    return str(pathto(f"{OUTPUT_STATIC_DIR}/{href}", resource=True))
 
-    # legacy check for "static-file"
-    if FILE_FIELD in favicon:
-        favicon["href"] = favicon.pop(FILE_FIELD)
 
-    # check if link is absolute
-    link = favicon["href"]
-    is_absolute = bool(urlparse(link).netloc) or link.startswith("/")
+def _normalize_favicons(favicons: FaviconsDef) -> List[Dict[str, str]]:
+    """Normalize the favicon configuration into a list of dicts.
 
-    # if the link is absolute do nothing, else replace it with a full one
-    if not is_absolute:
-        # `pathto` may return a `_StrPath`, cast to `str` for consistent typing
-        favicon["href"] = str(pathto(f"{OUTPUT_STATIC_DIR}/{link}", resource=True))
+    Strings are converted into ``{"href": <value>}`` and invalid items are dropped
+    with a warning. Every dict is copied so that the user config is never modified.
 
-    return favicon
+    Args:
+        favicons: Favicon data from configuration. Can be a single dict or a list of dicts.
+
+    Returns:
+        A list of favicon descriptions
+    """
+    # force cast the favicon config as a list
+    if isinstance(favicons, dict):
+        favicons = [favicons]
+
+    normalized = []
+    for favicon in favicons:
+        if isinstance(favicon, str):
+            favicon = {"href": favicon}
+
+        if not isinstance(favicon, dict):
+            _problems.add(
+                str(favicon),
+                "config",
+                f"Invalid config value for favicon extension: {favicon}."
+                "Custom favicons will not be included in build.",
+            )
+            continue
+        normalized.append(cast(Dict[str, str], favicon).copy())
+
+    return normalized
+
+
+def resolve_favicons(
+    favicons: FaviconsDef,
+    static_path: Sequence[Union[str, PathLike[str]]],
+    confdir: Union[str, PathLike[str]],
+    cache: Optional[RemoteSizeCache] = None,
+    max_workers: int = 1,
+    dimensions: Optional[Dict[str, str]] = None,
+    index: Optional[StaticFileIndex] = None,
+    vendor: Optional[Path] = None,
+) -> List[Favicon]:
+    """Resolve the page independent attributes of the favicons.
+
+    The configuration is normalized, the ``sizes``, ``rel`` and ``type`` attributes
+    are computed and the favicons are compiled. Only the ``href`` of static files
+    remains to be set for each page.
+    The sizes provided in ``dimensions`` are used first. When a cache is provided, the
+    remaining remote favicons are fetched concurrently. When a ``vendor`` folder is
+    also provided, they are downloaded in it and turned into static files.
+
+    Args:
+        favicons: Favicon data from configuration. Can be a single dict or a list of dicts.
+        static_path: the static_path registered in the application
+        confdir: the source directory of the documentation
+        cache: the persistent cache of remote sizes
+        max_workers: the maximum number of concurrent requests
+        dimensions: the sizes of the favicons keyed by ``href``
+        index: the index of the static files
+        vendor: the static folder storing the vendored remote favicons
+
+    Returns:
+        The compiled favicons
+    """
+    index = index or StaticFileIndex(static_path, confdir)
+    with _stats.stage("normalize"):
+        normalized = _normalize_favicons(favicons)
+    for favicon in normalized:
+        link = favicon.get("href") or favicon.get(FILE_FIELD)
+        if dimensions and link in dimensions and favicon.get("sizes") is None:
+            favicon["sizes"] = dimensions[link]
+
+    if cache is not None and vendor is not None:
+        with _stats.stage("vendor"):
+            _vendor_remote_favicons(normalized, cache, vendor, max_workers)
+        index.folders.append(vendor)
+
+    if cache is not None:
+        with _stats.stage("prefetch"):
+            _prefetch_remote_sizes(_remote_links(normalized), cache, max_workers)
+
+    with _stats.stage("resolve"):
+        return [
+            Favicon.from_dict(_sizes(favicon, static_path, confdir, cache, index))
+            for favicon in normalized
+        ]
+
+
+def _render_favicons(
+    pathto: Callable, favicons: Sequence[Favicon], browserconfig: bool = False
+) -> str:
+    """Render resolved favicons for a specific page.
+
+    Args:
+        pathto: Sphinx helper_ function to handle relative URLs
+        favicons: The compiled favicons
+        browserconfig: If the page links to the ``browserconfig.xml`` file of the site
+
+    Returns:
+        ``<link>`` elements for all favicons.
+    """
+    tags = [generate_meta(f, _static_to_href(pathto, f)) for f in favicons]
+    if browserconfig:
+        # browsers only look for the file at the root of the domain by default
+        href = str(pathto(BROWSERCONFIG_FILE, resource=True))
+        tags.append(generate_meta({"name": "msapplication-config", "content": href}))
+
+    return "\n".join(tags)
 
 
 def create_favicons_meta(
@@ -209,28 +643,195 @@ def create_favicons_meta(
     See Also:
         https://www.sphinx-doc.org/en/master/templating.html#path
     """
-    # force cast the favicon config as a list
-    if isinstance(favicons, dict):
-        favicons = [favicons]
+    return _render_favicons(pathto, resolve_favicons(favicons, static_path, confdir))
+
+
+def _load_dimensions(
+    dimensions: Union[str, Dict[str, str], None], confdir: Union[str, PathLike[str]]
+) -> Dict[str, str]:
+    """Load the manifest of favicon sizes provided by the user.
+
+    Args:
+        dimensions: A dict of sizes keyed by ``href`` or the path to a json file
+            containing it, relative to the configuration directory
+        confdir: The source directory of the documentation
+
+    Returns:
+        The sizes of the favicons keyed by ``href``
+    """
+    if not isinstance(dimensions, str):
+        return dimensions or {}
+
+    path = Path(confdir) / dimensions
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        _problems.add(
+            str(path),
+            "config",
+            f"The favicon dimensions manifest ({path}) cannot be read.",
+        )
+        return {}
+
+
+def _copy_cached_favicons(
+    favicons: Sequence[Favicon], root: Path, static_dir: Path
+) -> None:
+    """Copy the favicons stored in a cache folder to the output static folder.
 
-    # read this list and create the links for each item
-    meta_favicons = []
+    Args:
+        favicons: The compiled favicons
+        root: The static folder of the cache (vendored or generated favicons)
+        static_dir: The static folder of the output
+    """
     for favicon in favicons:
-        if isinstance(favicon, str):
-            favicon = {"href": favicon}
+        if not (favicon.is_static and favicon.href):
+            continue
+        source, target = root / favicon.href, static_dir / favicon.href
+        # the files are named after their content, an existing copy is up to date
+        if source.is_file() and not target.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, target)
 
-        if not isinstance(favicon, dict):
-            logger.warning(
-                f"Invalid config value for favicon extension: {favicon}."
-                "Custom favicons will not be included in build."
+
+def builder_inited(app: Sphinx) -> None:
+    """Resolve the favicons once for the whole build.
+
+    The result is stored in the build environment and reused by every page. It is
+    computed in the main process before the write phase: the parallel writers
+    inherit it and never access the network or the static files themselves.
+
+    Args:
+        app: The sphinx application
+    """
+    favicons: Optional[FaviconsDef] = app.config["favicons"]
+    master: Optional[str] = app.config["favicons_generate"]
+    static_path = cast(Sequence[Union[str, PathLike[str]]], app.config["html_static_path"])  # type: ignore[assignment]
+
+    resolved: List[Favicon] = []
+    browserconfig = False
+    if (favicons or master) and app.builder.format == "html":
+        parallel = app.parallel > 1
+        _problems.start(parallel)
+        if app.config["favicons_report"]:
+            _stats.start(parallel)
+        _configure_http(
+            pool_size=app.config["favicons_http_pool_size"],
+            retries=app.config["favicons_http_retries"],
+            backoff=app.config["favicons_http_backoff"],
+            max_bytes=app.config["favicons_max_header_bytes"],
+        )
+        _reset_network_guard(
+            timeout=app.config["favicons_http_timeout"],
+            budget=app.config["favicons_network_budget"],
+            max_failures=app.config["favicons_http_max_failures"],
+            offline=_is_offline(app.config["favicons_offline"]),
+        )
+        cache = RemoteSizeCache(
+            Path(app.doctreedir) / CACHE_FILE, app.config["favicons_cache_ttl"]
+        )
+        vendor: Optional[Path] = None
+        if app.config["favicons_vendor_remote"]:
+            vendor = Path(app.doctreedir) / VENDOR_CACHE
+        index = StaticFileIndex(
+            static_path, app.confdir, Path(app.doctreedir) / FILES_CACHE
+        )
+        generated: Optional[Path] = None
+        if master:
+            generated = Path(app.doctreedir) / GENERATED_CACHE
+            with _stats.stage("generate"):
+                favicons_set = _generate_favicons(
+                    master, index, generated, app.config["favicons_manifest"]
+                )
+            index.folders.append(generated)
+            configured = [favicons] if isinstance(favicons, dict) else favicons or []
+            favicons = [*favicons_set, *configured]
+        resolved = resolve_favicons(
+            favicons or [],
+            static_path,
+            app.confdir,
+            cache,
+            app.config["favicons_max_workers"],
+            _load_dimensions(app.config["favicons_dimensions"], app.confdir),
+            index=index,
+            vendor=vendor,
+        )
+        cache.save()
+        static_dir = Path(app.outdir) / OUTPUT_STATIC_DIR
+        cached = [folder for folder in (vendor, generated) if folder is not None]
+        for folder in cached:
+            _copy_cached_favicons(resolved, folder, static_dir)
+        if app.config["favicons_inline_svg"] > 0:
+            with _stats.stage("inline"):
+                resolved = _inline_svg_favicons(
+                    resolved, index, app.config["favicons_inline_svg"]
+                )
+        if app.config["favicons_fingerprint"]:
+            optimize: Optional[Callable[[Path, str], bytes]] = None
+            if app.config["favicons_optimize"]:
+                optimized = Path(app.doctreedir) / OPTIMIZED_CACHE
+                optimize = partial(_optimize_file, cache_dir=optimized)
+            with _stats.stage("fingerprint"):
+                resolved = _fingerprint_favicons(
+                    resolved, index, static_dir, cached, optimize
+                )
+        if app.config["favicons_manifest"]:
+            app.env.favicons_all = tuple(resolved)  # type: ignore[attr-defined]
+            browserconfig = _browserconfig(resolved, OUTPUT_STATIC_DIR) is not None
+            resolved = [f for f in resolved if _is_essential(f)]
+            resolved.append(
+                Favicon.from_dict({"rel": "manifest", "href": MANIFEST_FILE})
             )
-            continue
-        favicon = cast(Dict[str, str], favicon)
-        favicon = _sizes(favicon, static_path, confdir)
-        tag = generate_meta(_static_to_href(pathto, favicon))
-        meta_favicons.append(tag)
+        index.save()
+        hashes = _build_info_hashes(app) if app.config["favicons_patch_html"] else None
+        if hashes is not None:
+            # the pages are not written again if their build info is up to date
+            if _only_favicons_changed(app, hashes):
+                with _stats.stage("patch"):
+                    render = partial(
+                        _render_favicons,
+                        favicons=tuple(resolved),
+                        browserconfig=browserconfig,
+                    )
+                    if _patch_html_files(app, render):
+                        build_info = app.builder.build_info  # type: ignore[attr-defined]
+                        build_info.dump(Path(app.outdir) / ".buildinfo")
+            state = Path(app.doctreedir) / PATCH_STATE
+            state.parent.mkdir(parents=True, exist_ok=True)
+            state.write_text(json.dumps(hashes))
+        _guard.warn_skipped()
+    app.env.favicons_resolved = tuple(resolved)  # type: ignore[attr-defined]
+    app.env.favicons_browserconfig = browserconfig  # type: ignore[attr-defined]
+    app.env.favicons_rendered = {}  # type: ignore[attr-defined]
+
+
+def build_finished(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Post-process the favicons and report the problems and statistics of the build.
+
+    The network resources of the build are released and its network budget is lifted.
 
-    return "\n".join(meta_favicons)
+    Args:
+        app: The sphinx application
+        exception: The exception raised by the build if any
+    """
+    favicons: Sequence[Favicon] = getattr(app.env, "favicons_resolved", ())
+    if favicons and app.config["favicons_manifest"]:
+        favicons = getattr(app.env, "favicons_all", favicons)
+    if exception is None and favicons and app.config["favicons_optimize"]:
+        with _stats.stage("optimize"):
+            _optimize_favicons(
+                favicons,
+                Path(app.outdir) / OUTPUT_STATIC_DIR,
+                Path(app.doctreedir) / OPTIMIZED_CACHE,
+            )
+    if exception is None and favicons and app.config["favicons_manifest"]:
+        _write_manifests(
+            favicons, app.config["project"], Path(app.outdir), OUTPUT_STATIC_DIR
+        )
+    _problems.report()
+    _stats.report(app.outdir)
+    _close_session()
+    _reset_network_guard()
 
 
 def html_page_context(
@@ -250,16 +851,28 @@ def html_page_context(
         doctree: the docutils document tree
     """
     # extract parameters from app
-    favicons: Optional[FaviconsDef] = app.config["favicons"]
+    favicons: Sequence[Favicon] = getattr(app.env, "favicons_resolved", ())
+    rendered: Dict[str, str] = getattr(app.env, "favicons_rendered", {})
     pathto: Callable = context["pathto"]
-    static_path = cast(Sequence[Union[str, PathLike[str]]], app.config["html_static_path"])  # type: ignore[assignment]
-    confdir: Union[str, PathLike[str]] = app.confdir
 
     if not (doctree and favicons):
         return
 
-    favicons_meta = create_favicons_meta(pathto, favicons, static_path, confdir)
-    context["metatags"] += favicons_meta
+    start = time.perf_counter() if _stats.enabled else 0.0
+
+    # the output only depends on the relative path to the static folder, pages at the
+    # same depth reuse the same block
+    prefix = str(pathto(OUTPUT_STATIC_DIR, resource=True))
+    if prefix not in rendered:
+        browserconfig = getattr(app.env, "favicons_browserconfig", False)
+        rendered[prefix] = _render_favicons(pathto, favicons, browserconfig)
+        if app.config["favicons_patch_html"]:
+            rendered[prefix] = f"\n    {_delimit(rendered[prefix])}"
+
+    context["metatags"] += rendered[prefix]
+    _problems.page_written()
+    if _stats.enabled:
+        _stats.page_rendered(time.perf_counter() - start)
 
 
 def setup(app: Sphinx) -> Dict[str, Any]:
@@ -272,7 +885,28 @@ def setup(app: Sphinx) -> Dict[str, Any]:
         the 2 parralel parameters set to ``True``
     """
     app.add_config_value("favicons", None, "html")
+    app.add_config_value("favicons_cache_ttl", 24 * 60 * 60, "", [int, float])
+    app.add_config_value("favicons_http_pool_size", 10, "", [int])
+    app.add_config_value("favicons_http_retries", 3, "", [int])
+    app.add_config_value("favicons_http_backoff", 0.3, "", [int, float])
+    app.add_config_value("favicons_max_workers", 8, "", [int])
+    app.add_config_value("favicons_max_header_bytes", MAX_HEADER_BYTES, "", [int])
+    app.add_config_value("favicons_http_timeout", 10, "", [int, float])
+    app.add_config_value("favicons_network_budget", 60, "", [int, float])
+    app.add_config_value("favicons_http_max_failures", 3, "", [int])
+    app.add_config_value("favicons_offline", None, "", [bool])
+    app.add_config_value("favicons_dimensions", None, "html", [dict, str])
+    app.add_config_value("favicons_report", False, "", [bool])
+    app.add_config_value("favicons_vendor_remote", False, "html", [bool])
+    app.add_config_value("favicons_fingerprint", False, "html", [bool])
+    app.add_config_value("favicons_generate", None, "html", [str])
+    app.add_config_value("favicons_inline_svg", 0, "html", [int])
+    app.add_config_value("favicons_optimize", False, "html", [bool])
+    app.add_config_value("favicons_manifest", False, "html", [bool])
+    app.add_config_value("favicons_patch_html", False, "html", [bool])
+    app.connect("builder-inited", builder_inited)
     app.connect("html-page-context", html_page_context)
+    app.connect("build-finished", build_finished)
 
     return {
         "parallel_read_safe": True,
@@ -0,0 +1,63 @@
+"""Content-hashed file names of the static favicons."""
+
+from __future__ import annotations
+
+import shutil
+from dataclasses import replace
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, cast
+
+from .images import _digest, _file_digest
+
+if TYPE_CHECKING:
+    from . import Favicon, StaticFileIndex
+
+
+def _fingerprint_favicons(
+    favicons: Sequence[Favicon],
+    index: StaticFileIndex,
+    static_dir: Path,
+    exclude: Sequence[Path] = (),
+    optimize: Optional[Callable[[Path, str], bytes]] = None,
+) -> List[Favicon]:
+    """Copy the static favicons to content-hashed file names in the output.
+
+    The hash of a file is only computed again when its modification time or its size
+    changes. If the favicons are optimized, the copies are the optimized files and
+    their name is the hash of the optimized content.
+
+    Args:
+        favicons: The compiled favicons
+        index: The index of the static files
+        static_dir: The static folder of the output
+        exclude: The static folders whose files are already named after their content
+        optimize: The function optimizing a favicon file from its path and its link
+
+    Returns:
+        The favicons referencing their fingerprinted copy
+    """
+    fingerprinted: List[Favicon] = []
+    for favicon in favicons:
+        file = index.find(favicon.href) if favicon.is_static and favicon.href else None
+        if file is None or any(folder in file.parents for folder in exclude):
+            fingerprinted.append(favicon)
+            continue
+
+        href = PurePosixPath(cast(str, favicon.href))
+        content: Optional[bytes] = None
+        if optimize is None:
+            digest = index.stamped("digest", file, _file_digest)
+        else:
+            content = optimize(file, str(href))
+            digest = _digest(content)
+        name = str(href.with_name(f"{href.stem}.{digest}{href.suffix}"))
+        target = static_dir / name
+        if not target.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if content is None:
+                shutil.copyfile(file, target)
+            else:
+                target.write_bytes(content)
+        fingerprinted.append(replace(favicon, fingerprinted=name))
+
+    return fingerprinted
@@ -0,0 +1,161 @@
+"""Generation of the standard favicon set from a master image."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from .images import _digest, _file_digest
+from .network import VENDOR_DIR
+from .report import _problems, _stats
+
+if TYPE_CHECKING:
+    from . import StaticFileIndex
+
+
+GENERATED_CACHE: str = "favicons_generated"
+"name of the folder storing the generated favicons in the doctree directory"
+
+GENERATED_FAVICONS: List[Tuple[str, str, Tuple[int, ...]]] = [
+    ("icon", "favicon.ico", (16, 32, 48)),
+    ("icon", "favicon-16x16.png", (16,)),
+    ("icon", "favicon-32x32.png", (32,)),
+    ("apple-touch-icon", "apple-touch-icon.png", (180,)),
+    ("icon", "android-chrome-192x192.png", (192,)),
+    ("icon", "android-chrome-512x512.png", (512,)),
+]
+"rel, file name and sizes of the favicons generated from a master image"
+
+GENERATED_TILE: Tuple[str, str, Tuple[int, ...]] = (
+    "icon",
+    "mstile-150x150.png",
+    (150,),
+)
+"rel, file name and sizes of the tile generated for the ``browserconfig.xml`` file"
+
+
+def _render_icon(master: bytes, svg: bool, name: str, sizes: Tuple[int, ...]) -> bytes:
+    """Render a favicon of the generated set from the master image.
+
+    This function runs in the worker processes of the generation pool. The image is
+    centered on a transparent square if the master image is not square.
+
+    Args:
+        master: The content of the master image
+        svg: If the master image is a SVG file
+        name: The file name of the favicon, an ``.ico`` file contains every size
+        sizes: The widths of the square images of the favicon
+
+    Returns:
+        The content of the favicon file
+    """
+    from PIL import Image, ImageOps
+
+    size = max(sizes)
+    if svg:
+        import cairosvg
+
+        master = cairosvg.svg2png(
+            bytestring=master, output_width=size, output_height=size
+        )
+    image = Image.open(BytesIO(master)).convert("RGBA")
+    image = ImageOps.pad(image, (size, size), Image.Resampling.LANCZOS, (0, 0, 0, 0))
+
+    output = BytesIO()
+    if name.endswith(".ico"):
+        image.save(output, format="ICO", sizes=[(s, s) for s in sizes])
+    else:
+        image.save(output, format="PNG", optimize=True)
+
+    return output.getvalue()
+
+
+def _generate_favicons(
+    link: str, index: StaticFileIndex, root: Path, tile: bool = False
+) -> List[Dict[str, str]]:
+    """Generate the standard favicon set from a master image.
+
+    Each favicon is stored in ``root`` under a name derived from the hash of the
+    master image and from its specification, so that the images are only rendered
+    again when one of them changes. The files of the previous master images are
+    removed. The missing favicons are rendered in a process pool.
+
+    Args:
+        link: The path of the master image relative to the static folders
+        index: The index of the static files
+        root: The static folder storing the generated favicons
+        tile: Generate the 150x150 tile, only listed in the ``browserconfig.xml`` file
+
+    Returns:
+        The descriptions of the generated favicons, relative to ``root``
+    """
+    master = index.find(link)
+    if master is None:
+        _problems.add(
+            link,
+            "static",
+            f"The provided path ({link}) is not part of any of the static path. "
+            "Favicons will not be generated.",
+        )
+        return []
+
+    digest = index.stamped("digest", master, _file_digest)
+    svg = master.suffix.lower() == ".svg"
+    favicons: List[Dict[str, str]] = [{"rel": "icon", "href": link}] if svg else []
+    missing: List[Tuple[str, str, Tuple[int, ...]]] = []
+    specs = [*GENERATED_FAVICONS, GENERATED_TILE] if tile else GENERATED_FAVICONS
+    for rel, name, sizes in specs:
+        path = PurePosixPath(name)
+        key = _digest(f"{digest}:{name}:{sizes}".encode())
+        file = f"{VENDOR_DIR}/{path.stem}.{key}{path.suffix}"
+        favicons.append(
+            {
+                "rel": rel,
+                "href": file,
+                "sizes": " ".join(f"{s}x{s}" for s in sizes),
+            }
+        )
+        if (root / file).is_file():
+            _stats.count("generate_cache_hit")
+        else:
+            _stats.count("generate_cache_miss")
+            missing.append((file, name, sizes))
+
+    # the files of the previous master images are never used again
+    files = {favicon["href"] for favicon in favicons}
+    folder = root / VENDOR_DIR
+    for stale in folder.iterdir() if folder.is_dir() else []:
+        if f"{VENDOR_DIR}/{stale.name}" not in files:
+            stale.unlink()
+
+    if not missing:
+        return favicons
+
+    data = master.read_bytes()
+    workers = min(len(missing), os.cpu_count() or 1)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            images = executor.map(
+                _render_icon,
+                repeat(data),
+                repeat(svg),
+                [name for _, name, _ in missing],
+                [sizes for _, _, sizes in missing],
+            )
+            (root / VENDOR_DIR).mkdir(parents=True, exist_ok=True)
+            for (file, _, _), image in zip(missing, images):
+                (root / file).write_bytes(image)
+    except Exception as error:
+        # any failure of the image libraries or of the worker processes
+        _problems.add(
+            link,
+            "generate",
+            f"The favicons cannot be generated from {link}: {error}",
+        )
+        return []
+
+    return favicons
@@ -0,0 +1,300 @@
+"""Decoding and minification of the favicon image files."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from xml.etree import ElementTree
+
+MAX_HEADER_BYTES: int = 256 * 1024
+"maximum number of bytes read to compute the size of a favicon"
+
+
+def _image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Decode the size of an image from the first bytes of the file.
+
+    Args:
+        data: The beginning of the image file
+
+    Returns:
+        The width and height of the image, ``None`` if the data are not sufficient
+    """
+    import imagesize
+
+    try:
+        w, h = imagesize.get(BytesIO(data))
+    except (struct.error, ValueError):
+        return None
+
+    return (int(w), int(h)) if w > 0 and h > 0 else None
+
+
+_SVG_ROOT = re.compile(rb"<svg\b([^>]*)>")
+"opening tag of the root element of a SVG file"
+
+_SVG_LENGTH = r"""(?:^|\s){}\s*=\s*["']\s*(\d+(?:\.\d+)?)\s*(?:px)?\s*["']"""
+"pattern of a length attribute of the SVG root element, in pixels"
+
+
+def _svg_sizes(data: bytes) -> Optional[str]:
+    """Decode the ``sizes`` of a SVG image from its root element.
+
+    A SVG with a ``viewBox`` scales to any size. Without it, the image has the fixed
+    size set by its ``width`` and ``height`` attributes.
+
+    Args:
+        data: The beginning of the SVG file
+
+    Returns:
+        ``"any"`` or the fixed size of the image, ``None`` if the root element is not
+        complete
+    """
+    root = _SVG_ROOT.search(data)
+    if root is None:
+        return None
+
+    attributes = root.group(1).decode("utf-8", "replace")
+    if "viewBox" in attributes:
+        return "any"
+
+    width = re.search(_SVG_LENGTH.format("width"), attributes)
+    height = re.search(_SVG_LENGTH.format("height"), attributes)
+    if width is None or height is None:
+        return "any"
+
+    return f"{round(float(width.group(1)))}x{round(float(height.group(1)))}"
+
+
+def _ico_sizes(data: bytes) -> Optional[str]:
+    """Decode the ``sizes`` of every image of an ICO file from its directory.
+
+    Args:
+        data: The beginning of the ICO file
+
+    Returns:
+        The sizes of the images, ``None`` if the directory is not complete
+    """
+    if len(data) < 6:
+        return None
+
+    count = struct.unpack_from("<H", data, 4)[0]
+    if count == 0 or len(data) < 6 + 16 * count:
+        return None
+
+    # a width or height of 0 stands for 256 pixels
+    sizes = {(data[6 + 16 * i] or 256, data[7 + 16 * i] or 256) for i in range(count)}
+    return " ".join(f"{w}x{h}" for w, h in sorted(sizes))
+
+
+def _webp_sizes(data: bytes) -> Optional[str]:
+    """Decode the ``sizes`` of a WebP image from its first RIFF chunk.
+
+    Args:
+        data: The beginning of the WebP file
+
+    Returns:
+        The size of the image, ``None`` if the chunk header is not complete
+    """
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30 and data[23:26] == b"\x9d\x01\x2a":
+        w, h = (v & 0x3FFF for v in struct.unpack_from("<HH", data, 26))
+    elif chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], "little")
+        w, h = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    elif chunk == b"VP8X" and len(data) >= 30:
+        w = int.from_bytes(data[24:27], "little") + 1
+        h = int.from_bytes(data[27:30], "little") + 1
+    else:
+        return None
+
+    return f"{w}x{h}"
+
+
+def _iso_boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Iterate over the ISOBMFF boxes contained in a slice of the data.
+
+    Args:
+        data: The beginning of the file
+        start: The offset of the first box
+        end: The offset of the end of the parent box
+
+    Yields:
+        The type, payload start and payload end of every box, truncated to the data
+    """
+    while start + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, start)
+        header = 8
+        if size == 1 and start + 16 <= end:
+            size, header = struct.unpack_from(">Q", data, start + 8)[0], 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield kind, start + header, min(start + size, end)
+        start += size
+
+
+def _avif_sizes(data: bytes) -> Optional[str]:
+    """Decode the ``sizes`` of an AVIF image from its ``ispe`` property box.
+
+    The property is read in the ``meta/iprp/ipco`` boxes. When several images are
+    described (like an alpha plane or thumbnails), the largest is the main image.
+
+    Args:
+        data: The beginning of the AVIF file
+
+    Returns:
+        The size of the image, ``None`` if the property boxes are not complete
+    """
+    boxes = [(b"", 0, len(data))]
+    # "meta" is a full box, its children start after the version and flags
+    for kind, skip in ((b"meta", 4), (b"iprp", 0), (b"ipco", 0)):
+        boxes = [
+            (k, s + skip, e)
+            for _, start, end in boxes
+            for k, s, e in _iso_boxes(data, start, end)
+            if k == kind
+        ]
+
+    sizes = [
+        struct.unpack_from(">II", data, s + 4)
+        for _, start, end in boxes
+        for k, s, e in _iso_boxes(data, start, end)
+        if k == b"ispe" and e - s >= 12
+    ]
+    if not sizes:
+        return None
+
+    w, h = max(sizes)
+    return f"{w}x{h}"
+
+
+def _header_sizes(data: bytes) -> Optional[str]:
+    """Decode the ``sizes`` attribute of an image from the first bytes of the file.
+
+    The format is detected from the content of the file, not from its extension.
+
+    Args:
+        data: The beginning of the image file
+
+    Returns:
+        The ``sizes`` attribute, ``None`` if the data are not sufficient
+    """
+    if data[:4] == b"\x00\x00\x01\x00":
+        return _ico_sizes(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _webp_sizes(data)
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return _avif_sizes(data)
+    if data.lstrip()[:1] == b"<":
+        return _svg_sizes(data)
+
+    size = _image_size(data)
+    return f"{size[0]}x{size[1]}" if size is not None else None
+
+
+def _digest(data: bytes) -> str:
+    """Compute the fingerprint of a file content.
+
+    Args:
+        data: The content of the file
+
+    Returns:
+        The beginning of the sha256 hash of the content
+    """
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _file_digest(path: Path) -> str:
+    """Compute the fingerprint of a file.
+
+    Args:
+        path: The file
+
+    Returns:
+        The beginning of the sha256 hash of the file content
+    """
+    return _digest(path.read_bytes())
+
+
+def _file_sizes(path: Path) -> Optional[str]:
+    """Decode the ``sizes`` attribute of an image file from its beginning.
+
+    Args:
+        path: The image file
+
+    Returns:
+        The ``sizes`` attribute, ``None`` if it cannot be decoded
+    """
+    with path.open("rb") as f:
+        return _header_sizes(f.read(MAX_HEADER_BYTES))
+
+
+_SVG_ENCODING = re.compile(rb"""<\?xml[^>]*?encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+"encoding named by the XML declaration of a SVG file"
+
+_BOMS: Tuple[Tuple[bytes, str], ...] = (
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+"byte order marks of the unicode encodings and the codecs reading them"
+
+
+def _decode_svg(data: bytes) -> str:
+    """Decode a SVG file.
+
+    Like an XML parser, the byte order mark is trusted first, then the encoding of
+    the XML declaration, UTF-8 being the default.
+
+    Args:
+        data: The content of the SVG file
+
+    Returns:
+        The text of the image
+
+    Raises:
+        UnicodeDecodeError: The content does not match its encoding
+        LookupError: The declared encoding is unknown
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return data.decode(encoding)
+
+    match = _SVG_ENCODING.match(data.lstrip())
+    return data.decode(match.group(1).decode("ascii") if match else "utf-8")
+
+
+_SVG_NOISE = re.compile(r"<\?xml.*?\?>|<!--.*?-->|<!DOCTYPE[^>\[]*>", re.S)
+"parts of a SVG file not needed to render it, doctypes declaring entities are kept"
+
+
+def _minify_svg(svg: str) -> str:
+    """Minify a SVG image.
+
+    The XML declaration, comments, doctype and whitespace between tags are removed:
+    the result must be encoded in UTF-8, the default encoding of XML.
+
+    Args:
+        svg: The content of the SVG file
+
+    Returns:
+        The minified image
+
+    Raises:
+        ValueError: The minified image is not well-formed XML
+    """
+    svg = _SVG_NOISE.sub("", svg)
+    svg = re.sub(r"\s+", " ", re.sub(r">\s+<", "><", svg)).strip()
+    try:
+        ElementTree.fromstring(svg)
+    except ElementTree.ParseError as error:
+        raise ValueError(
+            f"the minified image is not well-formed XML: {error}"
+        ) from error
+
+    return svg
@@ -0,0 +1,74 @@
+"""Inlining of the small SVG favicons as ``data:`` URIs."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Sequence
+from urllib.parse import quote
+
+from .images import _decode_svg, _minify_svg
+from .report import _problems
+
+if TYPE_CHECKING:
+    from . import Favicon, StaticFileIndex
+
+
+def _svg_data_uri(path: Path) -> str:
+    """Minify a SVG file and encode it in a ``data:`` URI.
+
+    Only the characters that would break the ``href`` attribute or the URL are
+    percent-encoded.
+
+    Args:
+        path: The SVG file
+
+    Returns:
+        The ``data:`` URI of the image
+
+    Raises:
+        ValueError: The file does not match its encoding or is not well-formed XML
+        LookupError: The encoding declared by the file is unknown
+    """
+    svg = _minify_svg(_decode_svg(path.read_bytes()))
+    return "data:image/svg+xml," + quote(svg, safe=" !$&()*+,-./:;=?@_~")
+
+
+def _inline_svg_favicons(
+    favicons: Sequence[Favicon], index: StaticFileIndex, threshold: int
+) -> List[Favicon]:
+    """Replace the small static SVG favicons by ``data:`` URIs.
+
+    The URI of a file is only computed again when its modification time or its size
+    changes. A file that cannot be decoded or minified stays linked.
+
+    Args:
+        favicons: The compiled favicons
+        index: The index of the static files
+        threshold: The maximum length of an inlined URI
+
+    Returns:
+        The favicons, small SVG files being referenced by their content
+    """
+    inlined: List[Favicon] = []
+    for favicon in favicons:
+        file: Optional[Path] = None
+        if favicon.is_static and favicon.href and favicon.extension:
+            if favicon.extension.lower() == "svg":
+                file = index.find(favicon.href)
+        if file is not None:
+            try:
+                uri = index.stamped("svg_data", file, _svg_data_uri)
+            except (ValueError, LookupError) as error:
+                _problems.add(
+                    str(favicon.href),
+                    "static",
+                    f"The provided SVG file ({favicon.href}) cannot be minified, "
+                    f"it will not be inlined: {error}",
+                )
+                uri = None
+            if uri is not None and len(uri) <= threshold:
+                favicon = replace(favicon, href=uri, is_static=False)
+        inlined.append(favicon)
+
+    return inlined
@@ -0,0 +1,154 @@
+"""Web app manifest and ``browserconfig.xml`` file of the site."""
+
+from __future__ import annotations
+
+import html
+import json
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, cast
+
+if TYPE_CHECKING:
+    from . import Favicon
+
+
+MANIFEST_FILE: str = "site.webmanifest"
+"name of the web app manifest in the output static folder"
+
+BROWSERCONFIG_FILE: str = "browserconfig.xml"
+"name of the tile configuration of Windows browsers at the root of the output"
+
+MAX_PAGE_ICON_SIZE: int = 48
+"size of the largest icon kept in the pages when a web app manifest is written"
+
+TILE_SIZES: Dict[str, str] = {
+    "70x70": "square70x70logo",
+    "150x150": "square150x150logo",
+    "310x150": "wide310x150logo",
+    "310x310": "square310x310logo",
+}
+"browserconfig tile elements matching the favicon sizes"
+
+
+def _is_essential(favicon: Favicon) -> bool:
+    """Check if a favicon must stay in the pages when a web app manifest is written.
+
+    The ``msapplication-*`` meta tags are moved to the ``browserconfig.xml`` file and
+    the icons larger than ``MAX_PAGE_ICON_SIZE`` to the manifest. Browsers only read
+    the tab icons and the ``apple-touch-icon`` from the pages.
+
+    Args:
+        favicon: The compiled favicon
+
+    Returns:
+        ``True`` if the favicon is rendered in the pages
+    """
+    attributes = dict(favicon.attributes)
+    if favicon.tag == "meta":
+        return not attributes.get("name", "").startswith("msapplication-")
+    if attributes.get("rel") != "icon":
+        return True
+
+    # an icon is kept if the browsers can use it in a tab
+    for size in attributes.get("sizes", "any").split():
+        match = re.fullmatch(r"(\d+)x(\d+)", size)
+        if match is None or max(map(int, match.groups())) <= MAX_PAGE_ICON_SIZE:
+            return True
+
+    return False
+
+
+def _manifest_src(favicon: Favicon, prefix: str = "") -> str:
+    """Get the location of a favicon from a file of the output.
+
+    Args:
+        favicon: The compiled favicon
+        prefix: The path of the static folder relative to the file
+
+    Returns:
+        The url of the favicon
+    """
+    if not favicon.is_static:
+        return cast(str, favicon.href)
+
+    return f"{prefix}{favicon.fingerprinted or favicon.href}"
+
+
+def _web_manifest(favicons: Sequence[Favicon], name: str) -> Dict[str, Any]:
+    """Create the web app manifest of the site.
+
+    Args:
+        favicons: The compiled favicons
+        name: The name of the project
+
+    Returns:
+        The content of the manifest, with the icons not rendered in the pages
+    """
+    manifest: Dict[str, Any] = {"name": name, "icons": []}
+    for favicon in favicons:
+        attributes = dict(favicon.attributes)
+        if favicon.tag == "meta" and attributes.get("name") == "theme-color":
+            manifest["theme_color"] = attributes.get("content")
+        elif favicon.tag == "link" and not _is_essential(favicon):
+            icon = {"src": _manifest_src(favicon), "sizes": attributes["sizes"]}
+            if favicon.mime_type:
+                icon["type"] = favicon.mime_type
+            manifest["icons"].append(icon)
+
+    return manifest
+
+
+def _browserconfig(favicons: Sequence[Favicon], static: str) -> Optional[str]:
+    """Create the tile configuration of Windows browsers.
+
+    Args:
+        favicons: The compiled favicons
+        static: The static folder of the output, relative to the output directory
+
+    Returns:
+        The content of the ``browserconfig.xml`` file, ``None`` if there is no tile
+    """
+    prefix = f"{static}/"
+    tile: List[str] = []
+    for favicon in favicons:
+        attributes = dict(favicon.attributes)
+        name, content = attributes.get("name"), attributes.get("content", "")
+        if name == "msapplication-TileColor":
+            tile.append(f"<TileColor>{html.escape(content)}</TileColor>")
+        elif name == "msapplication-TileImage":
+            # the content is used as is, like in the pages at the root of the output
+            tile.append(f'<square150x150logo src="{html.escape(content)}"/>')
+        elif favicon.tag == "link" and attributes.get("sizes") in TILE_SIZES:
+            src = _manifest_src(favicon, prefix)
+            element = TILE_SIZES[attributes["sizes"]]
+            tile.append(f'<{element} src="{html.escape(src)}"/>')
+
+    if not tile:
+        return None
+
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f"<browserconfig><msapplication><tile>{''.join(tile)}</tile></msapplication>"
+        "</browserconfig>\n"
+    )
+
+
+def _write_manifests(
+    favicons: Sequence[Favicon], name: str, outdir: Path, static: str
+) -> None:
+    """Write the web app manifest and the ``browserconfig.xml`` file of the site.
+
+    Args:
+        favicons: The compiled favicons
+        name: The name of the project
+        outdir: The output directory of the build
+        static: The static folder of the output, relative to the output directory
+    """
+    manifest = _web_manifest(favicons, name)
+    static_dir = outdir / static
+    static_dir.mkdir(parents=True, exist_ok=True)
+    (static_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+    browserconfig = _browserconfig(favicons, static)
+    if browserconfig is not None:
+        (outdir / BROWSERCONFIG_FILE).write_text(browserconfig)
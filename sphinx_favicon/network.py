@@ -0,0 +1,669 @@
+"""Remote favicon requests: shared HTTP session, network guard and caches."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+from urllib.parse import urlparse
+
+from sphinx.util import logging
+
+from .images import MAX_HEADER_BYTES, _digest, _header_sizes
+from .report import _problems, _stats
+
+# requests is only imported when a favicon needs to be measured
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE: str = "favicons_cache.json"
+"name of the remote size cache file in the doctree directory"
+
+CHUNK_SIZE: int = 4096
+"number of bytes read at once when streaming a remote favicon"
+
+VENDOR_DIR: str = "favicons"
+"folder of the vendored remote favicons, relative to the static folders"
+
+VENDOR_CACHE: str = "favicons_vendor"
+"name of the folder storing the vendored remote favicons in the doctree directory"
+
+MAX_VENDOR_BYTES: int = 1024 * 1024
+"maximum size of a vendored remote favicon"
+
+_session: Optional[requests.Session] = None
+"HTTP session shared by all the remote favicon requests of the build"
+
+_http_options: Dict[str, Any] = {
+    "pool_size": 10,
+    "retries": 3,
+    "backoff": 0.3,
+    "max_bytes": MAX_HEADER_BYTES,
+}
+"connection pool, retry policy and read limit of the remote favicon requests"
+
+_session_lock = threading.Lock()
+
+
+OFFLINE_ENV: str = "SPHINX_FAVICON_OFFLINE"
+"environment variable forcing the offline mode"
+
+OFFLINE_REASON: str = "the build is offline"
+"reason given for the favicons skipped in offline mode"
+
+
+class _NetworkGuard:
+    """Deadline budget and per-host circuit breaker of the remote favicon requests.
+
+    The requests to a host are sent one at a time until one of them gets a response,
+    so that a failing host trips the circuit breaker before every favicon is requested
+    concurrently.
+    """
+
+    def __init__(
+        self, timeout: float, budget: float, max_failures: int, offline: bool = False
+    ) -> None:
+        """Start the network guard of a build.
+
+        Args:
+            timeout: The maximum number of seconds of a single request
+            budget: The maximum number of seconds spent on the network during the build
+            max_failures: The number of failures after which a host is not requested anymore
+            offline: Forbid every request
+        """
+        self.lock = threading.Lock()
+        self.start(timeout, budget, max_failures, offline)
+
+    def start(
+        self, timeout: float, budget: float, max_failures: int, offline: bool = False
+    ) -> None:
+        """Start a new network budget and close every circuit breaker.
+
+        Args:
+            timeout: The maximum number of seconds of a single request
+            budget: The maximum number of seconds spent on the network during the build
+            max_failures: The number of failures after which a host is not requested anymore
+            offline: Forbid every request
+        """
+        with self.lock:
+            self.timeout = timeout
+            self.deadline = time.monotonic() + budget
+            self.budget = budget
+            self.max_failures = max_failures
+            self.offline = offline
+            self.failures: Dict[str, int] = {}
+            self.skipped: Dict[str, List[str]] = {}
+            self.reachable: Set[str] = set()
+            self.probes: Dict[str, threading.Lock] = {}
+
+    @contextmanager
+    def slot(self, link: str) -> Iterator[None]:
+        """Wait for the right to request a favicon.
+
+        Args:
+            link: The url of the favicon
+        """
+        host = urlparse(link).netloc
+        with self.lock:
+            probe = self.probes.setdefault(host, threading.Lock())
+
+        with probe:
+            if host not in self.reachable:
+                yield
+                return
+
+        # the host answered, its requests can be sent concurrently
+        yield
+
+    def blocked(self, link: str) -> Optional[str]:
+        """Check if a favicon can be requested.
+
+        Args:
+            link: The url of the favicon
+
+        Returns:
+            The reason why the request cannot be sent, ``None`` if it can
+        """
+        host = urlparse(link).netloc
+        with self.lock:
+            if self.offline:
+                return OFFLINE_REASON
+            if time.monotonic() >= self.deadline:
+                return f"the network budget of {self.budget}s is exhausted"
+            if self.failures.get(host, 0) >= self.max_failures:
+                return f"the host {host} failed {self.failures[host]} times"
+        return None
+
+    def request_timeout(self) -> float:
+        """Get the timeout of the next request.
+
+        Returns:
+            The request timeout, bounded by the remaining network budget
+        """
+        return max(min(self.timeout, self.deadline - time.monotonic()), 0.001)
+
+    def success(self, link: str) -> None:
+        """Record a request that got a response.
+
+        Args:
+            link: The url of the favicon
+        """
+        with self.lock:
+            self.reachable.add(urlparse(link).netloc)
+
+    def failure(self, link: str) -> None:
+        """Record a failed request.
+
+        Args:
+            link: The url of the favicon
+        """
+        host = urlparse(link).netloc
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+
+    def skip(self, link: str, reason: str) -> None:
+        """Record a favicon whose size will not be computed.
+
+        Args:
+            link: The url of the favicon
+            reason: The reason why it was not requested
+        """
+        with self.lock:
+            self.skipped.setdefault(reason, []).append(link)
+
+    def is_skipped(self, link: str) -> bool:
+        """Check if the request of a favicon was skipped.
+
+        Args:
+            link: The url of the favicon
+
+        Returns:
+            ``True`` if the favicon was not requested
+        """
+        return any(link in links for links in self.skipped.values())
+
+    def warn_skipped(self) -> None:
+        """Report one problem per reason for the skipped favicons."""
+        for reason, links in self.skipped.items():
+            message = (
+                f"The size of {len(links)} favicon(s) will not be computed "
+                f"because {reason}: {', '.join(links)}"
+            )
+            # skipping the network is expected in offline mode
+            if reason == OFFLINE_REASON:
+                logger.info(message)
+            else:
+                _problems.add(", ".join(links), "network", message)
+
+
+_guard = _NetworkGuard(timeout=10, budget=float("inf"), max_failures=3)
+"network guard of the current build, unbounded outside of a build"
+
+
+def _reset_network_guard(
+    timeout: float = 10,
+    budget: float = float("inf"),
+    max_failures: int = 3,
+    offline: bool = False,
+) -> None:
+    """Start a new network budget and close every circuit breaker.
+
+    Without arguments, the unbounded guard used outside of a build is restored.
+
+    Args:
+        timeout: The maximum number of seconds of a single request
+        budget: The maximum number of seconds spent on the network during the build
+        max_failures: The number of failures after which a host is not requested anymore
+        offline: Forbid every request
+    """
+    _guard.start(timeout, budget, max_failures, offline)
+
+
+def _is_offline(config_value: Optional[bool]) -> bool:
+    """Check if the build should run without network access.
+
+    Args:
+        config_value: The value of ``favicons_offline`` in conf.py
+
+    Returns:
+        The config value if set, otherwise the value of the ``SPHINX_FAVICON_OFFLINE``
+        environment variable
+    """
+    if config_value is not None:
+        return bool(config_value)
+
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def _configure_http(**options: Any) -> None:
+    """Set the options of the remote favicon requests.
+
+    The shared HTTP session is created lazily with these options on the first remote
+    request.
+
+    Args:
+        options: Any key of ``_http_options``
+    """
+    if any(_http_options[k] != v for k, v in options.items()):
+        _close_session()
+        _http_options.update(options)
+
+
+def _get_session() -> requests.Session:
+    """Get the shared HTTP session, creating it on first use.
+
+    Returns:
+        The session used for every remote favicon request
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            # a timeout is not retried, it would exceed the network budget
+            retry = Retry(
+                total=_http_options["retries"],
+                connect=0,
+                read=0,
+                backoff_factor=_http_options["backoff"],
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "HEAD"],
+            )
+            adapter = HTTPAdapter(
+                pool_connections=_http_options["pool_size"],
+                pool_maxsize=_http_options["pool_size"],
+                max_retries=retry,
+            )
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _close_session() -> None:
+    """Close the shared HTTP session and its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+class RemoteSizeCache:
+    """Persistent cache of the dimensions of remote favicons.
+
+    Entries are keyed by URL and store the ``sizes`` of the image, the ``ETag`` and
+    ``Last-Modified`` validators sent by the server and the time of the last fetch.
+    Entries younger than ``ttl`` are used without any network access, older ones are
+    revalidated with a conditional request.
+    """
+
+    def __init__(self, path: Optional[Path], ttl: float) -> None:
+        """Load the cache file.
+
+        Args:
+            path: The json file storing the cache, ``None`` to keep it in memory only
+            ttl: The number of seconds an entry is considered fresh
+        """
+        self.path = path
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.used: Set[str] = set()
+        self.results: Dict[str, Optional[str]] = {}
+
+        if path is not None and path.is_file():
+            try:
+                self.entries = json.loads(path.read_text())
+            except (OSError, ValueError):
+                logger.debug(f"[sphinx-favicon] cannot read cache file {path}")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get the cache entry of an url.
+
+        Args:
+            url: The url of the favicon
+
+        Returns:
+            The cache entry if any
+        """
+        self.used.add(url)
+        entry = self.entries.get(url)
+        # entries written by older versions only store the width and height
+        return entry if entry is not None and "sizes" in entry else None
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """Check if an entry can be used without revalidation.
+
+        Args:
+            entry: The cache entry
+
+        Returns:
+            ``True`` if the entry is younger than the ttl
+        """
+        return time.time() - entry.get("fetched", 0) < self.ttl
+
+    def set(
+        self,
+        url: str,
+        sizes: Optional[str],
+        headers: Optional[Mapping[str, str]] = None,
+        file: Optional[str] = None,
+    ) -> None:
+        """Store the size of a remote favicon.
+
+        Args:
+            url: The url of the favicon
+            sizes: The ``sizes`` attribute of the image
+            headers: The headers of the response holding the validators
+            file: The name of the vendored copy of the favicon
+        """
+        headers = headers or {}
+        self.used.add(url)
+        self.entries[url] = {
+            "sizes": sizes,
+            "file": file,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched": time.time(),
+        }
+
+    def touch(self, url: str) -> None:
+        """Mark an entry as revalidated.
+
+        Args:
+            url: The url of the favicon
+        """
+        self.entries[url]["fetched"] = time.time()
+
+    def save(self) -> None:
+        """Evict the stale entries unused in this build and write the cache file."""
+        self.entries = {
+            url: entry
+            for url, entry in self.entries.items()
+            if url in self.used or self.is_fresh(entry)
+        }
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
+        except OSError:
+            logger.debug(f"[sphinx-favicon] cannot write cache file {self.path}")
+
+
+def _remote_size(link: str, cache: Optional[RemoteSizeCache] = None) -> Optional[str]:
+    """Get the size of a remote favicon, at most once per build.
+
+    Args:
+        link: The url of the favicon
+        cache: The persistent cache of remote sizes
+
+    Returns:
+        The ``sizes`` attribute of the image, ``None`` if it cannot be read
+    """
+    if cache is not None and link in cache.results:
+        return cache.results[link]
+
+    size = _fetch_remote_size(link, cache)
+    if cache is not None:
+        cache.results[link] = size
+
+    return size
+
+
+def _stream_size(
+    response: requests.Response, max_bytes: int
+) -> Tuple[Optional[str], int]:
+    """Read a streamed response until the size of the image can be decoded.
+
+    Args:
+        response: The streamed response of the remote favicon
+        max_bytes: The maximum number of bytes to read
+
+    Returns:
+        The ``sizes`` attribute of the image, ``None`` if it cannot be decoded, and
+        the number of bytes read
+    """
+    data = b""
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        data += chunk
+        size = _header_sizes(data[:max_bytes])
+        if size is not None or len(data) >= max_bytes:
+            return size, len(data)
+
+    return None, len(data)
+
+
+def _fetch_remote_size(
+    link: str, cache: Optional[RemoteSizeCache] = None
+) -> Optional[str]:
+    """Fetch the size of a remote favicon.
+
+    A fresh cache entry is used as is. A stale one is revalidated with a conditional
+    request and kept as a fallback if the server cannot be reached. The image is
+    streamed and only read until its dimensions can be decoded.
+
+    Args:
+        link: The url of the favicon
+        cache: The persistent cache of remote sizes
+
+    Returns:
+        The ``sizes`` attribute of the image, ``None`` if it cannot be read
+    """
+    entry = cache.get(link) if cache is not None else None
+    if entry is not None and cache is not None and cache.is_fresh(entry):
+        _stats.count("remote_cache_hit")
+        return entry["sizes"]
+    _stats.count("remote_cache_miss" if entry is None else "remote_cache_stale")
+
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    # only the header of the image is needed, ask for the first bytes
+    max_bytes = _http_options["max_bytes"]
+    headers["Range"] = f"bytes=0-{max_bytes - 1}"
+
+    size: Optional[str] = None
+    status_code: int = -1
+    response_headers: Mapping[str, str] = {}
+    with _guard.slot(link):
+        reason = _guard.blocked(link)
+        if reason is None:
+            from requests.exceptions import RequestException
+
+            read, start = 0, time.perf_counter()
+            try:
+                with _stats.stage("remote_fetch"):
+                    response = _get_session().get(
+                        link,
+                        headers=headers,
+                        stream=True,
+                        timeout=_guard.request_timeout(),
+                    )
+                    _guard.success(link)
+                    try:
+                        status_code = response.status_code
+                        response_headers = response.headers
+                        if status_code in (200, 206):
+                            size, read = _stream_size(response, max_bytes)
+                    finally:
+                        response.close()
+            except RequestException:
+                _guard.failure(link)
+                status_code = -1
+            _stats.fetch(link, status_code, read, time.perf_counter() - start)
+
+    if status_code == 304 and entry is not None and cache is not None:
+        _stats.count("remote_cache_revalidated")
+        cache.touch(link)
+        return entry["sizes"]
+
+    if size is not None:
+        if cache is not None:
+            cache.set(link, size, response_headers)
+        return size
+
+    # serve the outdated value rather than nothing if the server cannot be reached
+    if entry is not None:
+        return entry["sizes"]
+
+    if reason is not None:
+        _guard.skip(link, reason)
+
+    return None
+
+
+def _read_content(response: requests.Response, max_bytes: int) -> Optional[bytes]:
+    """Read a whole streamed response.
+
+    Args:
+        response: The streamed response of the remote favicon
+        max_bytes: The maximum number of bytes to read
+
+    Returns:
+        The content of the response, ``None`` if it is larger than ``max_bytes``
+    """
+    data = b""
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        data += chunk
+        if len(data) > max_bytes:
+            return None
+
+    return data
+
+
+def _vendor_remote_favicon(
+    link: str, cache: RemoteSizeCache, folder: Path
+) -> Optional[str]:
+    """Download a remote favicon in the content-addressed folder of the vendored files.
+
+    The file is named after the hash of its content so that identical icons are
+    stored once. A fresh cache entry is used without any network access, a stale one
+    is revalidated with a conditional request and kept if the server cannot be reached.
+
+    Args:
+        link: The url of the favicon
+        cache: The persistent cache of remote favicons
+        folder: The folder storing the vendored files
+
+    Returns:
+        The name of the vendored file, ``None`` if the favicon cannot be downloaded
+    """
+    entry = cache.get(link)
+    name: Optional[str] = entry.get("file") if entry is not None else None
+    if name is not None and not (folder / name).is_file():
+        name = None
+    if entry is not None and name is not None and cache.is_fresh(entry):
+        _stats.count("vendor_cache_hit")
+        return name
+    _stats.count("vendor_cache_miss" if name is None else "vendor_cache_stale")
+
+    headers = {}
+    if entry is not None and name is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    content: Optional[bytes] = None
+    status_code: int = -1
+    response_headers: Mapping[str, str] = {}
+    with _guard.slot(link):
+        reason = _guard.blocked(link)
+        if reason is None:
+            from requests.exceptions import RequestException
+
+            start = time.perf_counter()
+            try:
+                with _stats.stage("vendor_fetch"):
+                    response = _get_session().get(
+                        link,
+                        headers=headers,
+                        stream=True,
+                        timeout=_guard.request_timeout(),
+                    )
+                    _guard.success(link)
+                    try:
+                        status_code = response.status_code
+                        response_headers = response.headers
+                        if status_code == 200:
+                            content = _read_content(response, MAX_VENDOR_BYTES)
+                    finally:
+                        response.close()
+            except RequestException:
+                _guard.failure(link)
+                status_code = -1
+            read = len(content) if content is not None else 0
+            _stats.fetch(link, status_code, read, time.perf_counter() - start)
+
+    if status_code == 304 and name is not None:
+        cache.touch(link)
+        return name
+
+    if content is not None:
+        suffix = Path(urlparse(link).path).suffix
+        name = f"{_digest(content)}{suffix}"
+        if not (folder / name).is_file():
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / name).write_bytes(content)
+        cache.set(link, _header_sizes(content), response_headers, name)
+        return name
+
+    # serve the outdated copy rather than nothing if the server cannot be reached
+    if name is not None:
+        return name
+
+    if reason is not None:
+        _guard.skip(link, reason)
+    else:
+        _problems.add(
+            link,
+            "remote",
+            f"The provided link ({link}) cannot be downloaded. "
+            "The favicon will not be vendored.",
+        )
+
+    return None
+
+
+def _prefetch_remote_sizes(
+    links: List[str], cache: RemoteSizeCache, max_workers: int
+) -> None:
+    """Fetch the size of all the remote favicons concurrently.
+
+    The results are stored in the cache so that the sizes of the build only depend
+    on the slowest favicon instead of the sum of all of them.
+
+    Args:
+        links: The urls of the remote favicons
+        cache: The persistent cache of remote sizes
+        max_workers: The maximum number of concurrent requests
+    """
+    if len(links) < 2 or max_workers < 2:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(links))) as executor:
+        list(executor.map(lambda link: _remote_size(link, cache), links))
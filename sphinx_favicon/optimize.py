@@ -0,0 +1,200 @@
+"""Optimization and precompression of the favicon files of the output."""
+
+from __future__ import annotations
+
+import gzip
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence, Set
+
+from .images import _decode_svg, _digest, _minify_svg
+from .report import _problems, _stats
+
+if TYPE_CHECKING:
+    from . import Favicon
+
+
+OPTIMIZED_CACHE: str = "favicons_optimized"
+"name of the folder storing the optimized favicons in the doctree directory"
+
+COMPRESSIBLE_TYPES: List[str] = ["bmp", "ico", "svg"]
+"list of file types worth precompressing"
+
+
+def _optimize_image(data: bytes, extension: str) -> bytes:
+    """Losslessly reduce the size of an image.
+
+    SVG images are minified and written in UTF-8, their XML declaration being
+    removed. PNG images are recompressed without their metadata chunks if Pillow is
+    installed, the transparency and color profile are kept.
+
+    Args:
+        data: The content of the image file
+        extension: The file extension of the image
+
+    Returns:
+        The optimized image, or the original one if it cannot be reduced
+
+    Raises:
+        ValueError: The SVG image does not match its encoding
+        LookupError: The encoding declared by the SVG image is unknown
+        OSError: The PNG image cannot be read by Pillow
+    """
+    optimized = data
+    if extension == "svg":
+        optimized = _minify_svg(_decode_svg(data)).encode("utf-8")
+    elif extension == "png":
+        try:
+            from PIL import Image
+        except ImportError:
+            return data
+
+        image = Image.open(BytesIO(data))
+        keep = {
+            k: image.info[k] for k in ("transparency", "icc_profile") if k in image.info
+        }
+        output = BytesIO()
+        image.save(output, format="PNG", optimize=True, **keep)
+        optimized = output.getvalue()
+
+    return optimized if len(optimized) < len(data) else data
+
+
+def _optimizers() -> str:
+    """Name the optimizers available to :func:`_optimize_image`.
+
+    The name is part of the cache keys, so that the favicons cached before an optional
+    optimizer is installed are optimized again.
+
+    Returns:
+        The name of the installed optional optimizers
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return "svg"
+
+    return "svg-png"
+
+
+def _cache_file(data: bytes, suffix: str, cache_dir: Path) -> Path:
+    """Compute the cache file of a favicon content.
+
+    Args:
+        data: The content of the favicon file
+        suffix: The file extension of the favicon, with its dot
+        cache_dir: The folder storing the optimized favicons
+
+    Returns:
+        The file storing the optimized content
+    """
+    return cache_dir / f"{_digest(data)}-{_optimizers()}{suffix}"
+
+
+def _optimize_file(path: Path, href: str, cache_dir: Path) -> bytes:
+    """Optimize a favicon file, reusing the result of the previous builds.
+
+    The result is stored in ``cache_dir`` under the hash of the processed content,
+    so that an unchanged favicon, original or already optimized, is never processed
+    again. A favicon that cannot be read is kept as is and reported.
+
+    Args:
+        path: The favicon file
+        href: The link of the favicon, used in the reports
+        cache_dir: The folder storing the optimized favicons
+
+    Returns:
+        The optimized content of the file
+    """
+    data = path.read_bytes()
+    cached = _cache_file(data, path.suffix, cache_dir)
+    if cached.is_file():
+        _stats.count("optimize_cache_hit")
+        return cached.read_bytes()
+
+    _stats.count("optimize_cache_miss")
+    try:
+        optimized = _optimize_image(data, path.suffix[1:].lower())
+    except (ValueError, LookupError, OSError) as error:
+        _problems.add(
+            href,
+            "static",
+            f"The provided file ({href}) cannot be read, "
+            f"it will not be optimized: {error}",
+        )
+        optimized = data
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cached.write_bytes(optimized)
+    # the optimized file is the input of the next builds if it's not replaced
+    _cache_file(optimized, path.suffix, cache_dir).write_bytes(optimized)
+
+    return optimized
+
+
+def _precompress(data: bytes, cached: Path) -> Dict[str, bytes]:
+    """Compress a favicon for the static servers serving precompressed files.
+
+    Brotli is only used if the ``brotli`` package is installed.
+
+    Args:
+        data: The content of the favicon file
+        cached: The cache file of the favicon, the compressed files are stored next to it
+
+    Returns:
+        The compressed contents smaller than the original, keyed by file suffix
+    """
+    compressors: Dict[str, Callable[[bytes], bytes]] = {
+        ".gz": lambda d: gzip.compress(d, compresslevel=9, mtime=0)
+    }
+    try:
+        import brotli
+
+        compressors[".br"] = brotli.compress
+    except ImportError:
+        pass
+
+    variants: Dict[str, bytes] = {}
+    for suffix, compress in compressors.items():
+        file = cached.with_name(cached.name + suffix)
+        if file.is_file():
+            compressed = file.read_bytes()
+        else:
+            compressed = compress(data)
+            file.write_bytes(compressed)
+        if len(compressed) < len(data):
+            variants[suffix] = compressed
+
+    return variants
+
+
+def _optimize_favicons(
+    favicons: Sequence[Favicon], static_dir: Path, cache_dir: Path
+) -> None:
+    """Optimize the static favicons of the output and write their compressed siblings.
+
+    The fingerprinted copies are already optimized when they are created, their name
+    being the hash of the optimized content.
+
+    Args:
+        favicons: The compiled favicons
+        static_dir: The static folder of the output
+        cache_dir: The folder storing the optimized favicons
+    """
+    done: Set[Path] = set()
+    for favicon in favicons:
+        if not (favicon.is_static and favicon.href):
+            continue
+        path = static_dir / (favicon.fingerprinted or favicon.href)
+        if path in done or not path.is_file():
+            continue
+        done.add(path)
+
+        data = path.read_bytes()
+        optimized = _optimize_file(path, favicon.href, cache_dir)
+        if optimized != data:
+            path.write_bytes(optimized)
+
+        if path.suffix[1:].lower() in COMPRESSIBLE_TYPES:
+            cached = _cache_file(optimized, path.suffix, cache_dir)
+            for suffix, compressed in _precompress(optimized, cached).items():
+                path.with_name(path.name + suffix).write_bytes(compressed)
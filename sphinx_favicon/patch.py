@@ -0,0 +1,165 @@
+"""In place update of the favicon block of existing pages."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, cast
+
+from sphinx.application import Sphinx
+
+from .network import CHUNK_SIZE
+
+PATCH_STATE: str = "favicons_patch.json"
+"name of the file recording the configuration of the last build in the doctree directory"
+
+FAVICONS_START: str = "<!-- sphinx-favicon -->"
+"comment opening the favicon block of the pages that can be patched"
+
+FAVICONS_END: str = "<!-- /sphinx-favicon -->"
+"comment closing the favicon block of the pages that can be patched"
+
+
+def _delimit(block: str) -> str:
+    """Surround the favicon block of a page with the patch delimiters.
+
+    Args:
+        block: The favicon tags of the page
+
+    Returns:
+        The delimited block
+    """
+    return f"{FAVICONS_START}\n{block}\n    {FAVICONS_END}"
+
+
+def _build_info_hashes(app: Sphinx) -> Optional[Dict[str, str]]:
+    """Hash the configuration of the build, with and without the favicon values.
+
+    The hashes are computed like the ``.buildinfo`` file of the html builders, the
+    favicon values are the ones whose change only affects the favicon block.
+
+    Args:
+        app: The sphinx application
+
+    Returns:
+        The hashes of the configuration and of the tags, ``None`` if the builder does
+        not record its configuration
+    """
+    create_build_info = getattr(app.builder, "create_build_info", None)
+    if create_build_info is None:
+        return None
+
+    names = [
+        c.name
+        for c in app.config.filter({"html"})
+        if c.name.startswith("favicons") and c.name != "favicons_patch_html"
+    ]
+    values = {name: app.config[name] for name in names}
+    full = create_build_info()
+    try:
+        for name in names:
+            app.config[name] = None
+        others = create_build_info()
+    finally:
+        for name, value in values.items():
+            app.config[name] = value
+
+    return {
+        "full": full.config_hash,
+        "others": others.config_hash,
+        "tags": full.tags_hash,
+    }
+
+
+def _only_favicons_changed(app: Sphinx, hashes: Dict[str, str]) -> bool:
+    """Check if the favicons are the only change since the last build.
+
+    Args:
+        app: The sphinx application
+        hashes: The configuration hashes of the build
+
+    Returns:
+        ``True`` if the existing pages only need a new favicon block
+    """
+    state = Path(app.doctreedir) / PATCH_STATE
+    try:
+        previous = json.loads(state.read_text())
+        build_info = type(app.builder.build_info).load(  # type: ignore[attr-defined]
+            Path(app.outdir) / ".buildinfo"
+        )
+    except (OSError, ValueError):
+        return False
+
+    # the output must come from the last recorded build
+    return (
+        build_info.config_hash == previous.get("full") != hashes["full"]
+        and previous.get("others") == hashes["others"]
+        and previous.get("tags") == hashes["tags"] == build_info.tags_hash
+    )
+
+
+def _patch_html_file(
+    path: Path, outdir: Path, render: Callable[[Callable], str]
+) -> bool:
+    """Replace the favicon block of an existing page.
+
+    The page is streamed: only its beginning, up to the end of the block, is read in
+    memory and the rest is copied as is.
+
+    Args:
+        path: The html file of the page
+        outdir: The output directory of the build
+        render: The function rendering the favicon tags of a page from its ``pathto``
+
+    Returns:
+        ``True`` if the page was patched, ``False`` if it has no favicon block
+    """
+    folder = path.parent
+
+    def pathto(otheruri: str, resource: bool = False) -> str:
+        return Path(os.path.relpath(outdir / otheruri, folder)).as_posix()
+
+    patched = path.with_name(f"{path.name}.favicons")
+    with path.open(encoding="utf-8", newline="") as source:
+        head = ""
+        while FAVICONS_END not in head:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                return False
+            head += chunk
+        start, end = head.find(FAVICONS_START), head.index(FAVICONS_END)
+        if not 0 <= start < end:
+            return False
+
+        block = _delimit(render(pathto))
+        with patched.open("w", encoding="utf-8", newline="") as target:
+            target.write(head[:start] + block + head[end + len(FAVICONS_END) :])
+            shutil.copyfileobj(source, target)
+
+    os.replace(patched, path)
+    return True
+
+
+def _patch_html_files(app: Sphinx, render: Callable[[Callable], str]) -> bool:
+    """Replace the favicon block of every existing page, in parallel.
+
+    Args:
+        app: The sphinx application
+        render: The function rendering the favicon tags of a page from its ``pathto``
+
+    Returns:
+        ``True`` if every page was patched
+    """
+    builder = cast(Any, app.builder)
+    pages = [Path(builder.get_outfilename(docname)) for docname in app.env.all_docs]
+    pages = [page for page in pages if page.is_file()]
+    outdir = Path(app.outdir)
+    with ThreadPoolExecutor() as executor:
+        patched = list(
+            executor.map(lambda page: _patch_html_file(page, outdir, render), pages)
+        )
+
+    return all(patched)
@@ -0,0 +1,227 @@
+"""Problems and instrumentation of the favicon stages of a build."""
+
+from __future__ import annotations
+
+import ctypes
+import json
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILE: str = "favicons_report.json"
+"name of the instrumentation report in the output directory"
+
+
+class _ProblemLog:
+    """Distinct problems met while resolving the favicons of a build.
+
+    During a build, each problem is recorded once and reported at ``build-finished``
+    with the number of pages it affects. Outside of a build, problems are reported
+    right away.
+    """
+
+    def __init__(self) -> None:
+        """Create an inactive log."""
+        self.active = False
+        self.problems: Dict[Tuple[str, str], str] = {}
+        self.pages: Any = None
+        self.lock: Any = threading.Lock()
+
+    def start(self, parallel: bool = False) -> None:
+        """Start recording the problems of a build.
+
+        Args:
+            parallel: The pages are written by forked processes
+        """
+        self.active = True
+        self.problems = {}
+        # shared memory is inherited by the forked writers of parallel builds, serial
+        # builds don't need the semaphores of multiprocessing
+        if parallel:
+            self.pages = multiprocessing.Value("i", 0)
+            self.lock = self.pages.get_lock()
+        else:
+            self.pages, self.lock = ctypes.c_int(0), threading.Lock()
+
+    def add(self, favicon: str, subtype: str, message: str) -> None:
+        """Record a problem.
+
+        Args:
+            favicon: The favicon affected by the problem
+            subtype: The warning subtype, used to filter the warnings
+            message: The description of the problem
+        """
+        if not self.active:
+            logger.warning(message, type="favicon", subtype=subtype)
+        else:
+            self.problems.setdefault((favicon, subtype), message)
+
+    def page_written(self) -> None:
+        """Count a page including the favicons."""
+        if self.pages is not None:
+            with self.lock:
+                self.pages.value += 1
+
+    def report(self) -> None:
+        """Emit one warning per distinct problem and stop recording.
+
+        The number of affected pages is omitted when no page was written, like in the
+        incremental builds where every page is up to date.
+        """
+        pages = self.pages.value if self.pages is not None else 0
+        affected = f" ({pages} page(s) affected)" if pages else ""
+        for (_, subtype), message in self.problems.items():
+            logger.warning(f"{message}{affected}", type="favicon", subtype=subtype)
+        self.active, self.problems, self.pages = False, {}, None
+
+
+class _BuildStats:
+    """Counters and timers of the favicon stages of a build.
+
+    Recording is disabled by default and costs a single attribute check per call.
+    In parallel builds, the page counters live in shared memory so that the renders of
+    the forked writers are included in the report.
+    """
+
+    def __init__(self) -> None:
+        """Create a disabled recorder."""
+        self.enabled = False
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.fetches: List[Dict[str, Any]] = []
+        self.pages: Any = None
+        self.pages_lock: Any = None
+        self.lock = threading.Lock()
+
+    def start(self, parallel: bool = False) -> None:
+        """Start recording the stages of a build.
+
+        Args:
+            parallel: The pages are written by forked processes
+        """
+        self.enabled = True
+        self.stages, self.counters, self.fetches = {}, {}, []
+        # number of pages, total and maximum render time
+        if parallel:
+            self.pages = multiprocessing.Array("d", 3)
+            self.pages_lock = self.pages.get_lock()
+        else:
+            self.pages, self.pages_lock = (ctypes.c_double * 3)(), self.lock
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage.
+
+        Args:
+            name: The name of the stage
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0})
+                stage["count"] += 1
+                stage["seconds"] += elapsed
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            name: The name of the counter
+            n: The increment
+        """
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def fetch(self, link: str, status: int, size: int, seconds: float) -> None:
+        """Record a remote favicon request.
+
+        Args:
+            link: The url of the favicon
+            status: The HTTP status of the response, ``-1`` if the request failed
+            size: The number of bytes read from the response
+            seconds: The latency of the request
+        """
+        if self.enabled:
+            with self.lock:
+                self.fetches.append(
+                    {"url": link, "status": status, "bytes": size, "seconds": seconds}
+                )
+
+    def page_rendered(self, seconds: float) -> None:
+        """Record the time spent adding the favicons to a page.
+
+        Args:
+            seconds: The render time of the page
+        """
+        if self.enabled and self.pages is not None:
+            with self.pages_lock:
+                self.pages[0] += 1
+                self.pages[1] += seconds
+                self.pages[2] = max(self.pages[2], seconds)
+
+    def report(self, outdir: Union[str, PathLike[str]]) -> None:
+        """Log a summary, write the json report in the output directory and stop recording.
+
+        Args:
+            outdir: The output directory of the build
+        """
+        if not self.enabled:
+            return
+
+        pages, total, slowest = self.pages[:] if self.pages is not None else (0, 0, 0)
+        report: Dict[str, Any] = {
+            "stages": self.stages,
+            "counters": self.counters,
+            "fetches": self.fetches,
+            "pages": {
+                "count": int(pages),
+                "seconds": total,
+                "max_seconds": slowest,
+            },
+        }
+        self.enabled, self.stages, self.counters, self.fetches = False, {}, {}, []
+        self.pages = None
+
+        logger.info("[sphinx-favicon] build report:")
+        for name, stage in report["stages"].items():
+            logger.info(
+                f"    {name}: {stage['count']} call(s), {stage['seconds']:.3f}s"
+            )
+        for name, value in report["counters"].items():
+            logger.info(f"    {name}: {value}")
+        fetches = report["fetches"]
+        logger.info(
+            f"    remote fetches: {len(fetches)} request(s), "
+            f"{sum(f['bytes'] for f in fetches)} bytes, "
+            f"{sum(f['seconds'] for f in fetches):.3f}s"
+        )
+        logger.info(f"    pages: {int(pages)} rendered in {total:.3f}s")
+
+        path = Path(outdir) / REPORT_FILE
+        try:
+            path.write_text(json.dumps(report, indent=2, sort_keys=True))
+        except OSError:
+            logger.debug(f"[sphinx-favicon] cannot write report file {path}")
+
+
+_problems = _ProblemLog()
+"problems of the current build"
+
+_stats = _BuildStats()
+"instrumentation of the current build, disabled unless requested"
@@ -0,0 +1 @@
+"""Benchmarks of the sphinx-favicon extension."""
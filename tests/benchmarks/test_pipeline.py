@@ -0,0 +1,93 @@
+"""Microbenchmarks of the favicon pipeline.
+
+Run them with ``nox -s bench``, the results are compared with the ones of a base
+revision measured in the same session. The base revision runs these benchmarks too,
+so they only use the public entry points of the extension.
+"""
+
+import shutil
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import sphinx_favicon
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [1, 10, 50]
+"number of favicons in the benchmarked configurations"
+
+ICON = Path(__file__).parents[2] / "docs" / "source" / "_static" / "favicon-32x32.png"
+"image used for every favicon"
+
+
+def _pathto(otheruri: str, resource: bool = False) -> str:
+    """Stand-in for the Sphinx ``pathto`` helper of a nested page."""
+    return f"../{otheruri}"
+
+
+@pytest.fixture(scope="module")
+def static_dir(tmp_path_factory):
+    """A documentation folder with 50 favicons in its static path."""
+    confdir = tmp_path_factory.mktemp("bench")
+    static = confdir / "_static"
+    static.mkdir()
+    for i in range(max(SIZES)):
+        shutil.copy(ICON, static / f"icon-{i}.png")
+    return confdir
+
+
+@pytest.fixture(scope="module")
+def http_server(static_dir):
+    """A local HTTP server standing in for a CDN hosting the favicons."""
+    handler = partial(SimpleHTTPRequestHandler, directory=str(static_dir / "_static"))
+    handler.log_message = lambda *args: None  # type: ignore[attr-defined]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _local_favicons(n):
+    """Configuration with ``n`` local favicons."""
+    return [{"href": f"icon-{i}.png"} for i in range(n)]
+
+
+def _copies(favicons):
+    """Fresh copies of a configuration, some revisions complete the dicts in place."""
+    return [dict(f) for f in favicons]
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_generate_meta(benchmark, n):
+    """Render favicons whose attributes are all set."""
+    favicons = [
+        {"rel": "icon", "href": f"_static/icon-{i}.png", "sizes": "32x32"}
+        for i in range(n)
+    ]
+    benchmark(lambda: [sphinx_favicon.generate_meta(f) for f in _copies(favicons)])
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_create_favicons_meta(benchmark, n, static_dir):
+    """Resolve and render local favicons, measured in the static path."""
+    favicons = _local_favicons(n)
+    benchmark(
+        lambda: sphinx_favicon.create_favicons_meta(
+            _pathto, _copies(favicons), ["_static"], static_dir
+        )
+    )
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_create_favicons_meta_remote(benchmark, n, monkeypatch, http_server):
+    """Resolve and render remote favicons served by a local HTTP server."""
+    monkeypatch.undo()  # use the real network stack
+    favicons = [{"href": f"{http_server}/icon-{i}.png"} for i in range(n)]
+    benchmark(
+        lambda: sphinx_favicon.create_favicons_meta(_pathto, _copies(favicons), [], ".")
+    )
@@ -0,0 +1,164 @@
+"""End-to-end scaling harness of the extension on generated sites.
+
+The harness is skipped by default, run it with ``nox -s scaling``. The page counts
+are read from the ``SPHINX_FAVICON_SCALING`` environment variable, for example
+``SPHINX_FAVICON_SCALING=1000,10000,100000``.
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+import sphinx_favicon
+
+PAGES = [int(n) for n in os.environ.get("SPHINX_FAVICON_SCALING", "").split(",") if n]
+"number of pages of the generated sites"
+
+DEPTH = 4
+"maximum depth of the generated pages"
+
+CONFIGS = {
+    "local": ["mstile-150x150.png", "square.svg"],
+    "remote": [f"https://secure.example.com/favicon-{s}x{s}.png" for s in (16, 32)],
+    "mixed": None,  # the favicons of the test root
+}
+"favicon configurations of the builds"
+
+pytestmark = pytest.mark.skipif(
+    len(PAGES) < 2, reason="set SPHINX_FAVICON_SCALING to at least 2 page counts"
+)
+
+
+def _generate_site(srcdir: Path, pages: int) -> None:
+    """Write ``pages`` documents at varying depths in the site.
+
+    Args:
+        srcdir: the source directory of the site
+        pages: the number of pages to generate
+    """
+    for i in range(pages):
+        folders = [f"level{d}" for d in range(i % (DEPTH + 1))]
+        page = srcdir.joinpath("pages", *folders, f"page{i}.rst")
+        page.parent.mkdir(parents=True, exist_ok=True)
+        page.write_text(f"Page {i}\n{'=' * 20}\n\nNothing to see here...\n")
+
+
+def _measure(make_app, srcdir, config, parallel):
+    """Build a site and measure the cost of the extension.
+
+    Args:
+        make_app: factory of Sphinx applications
+        srcdir: the source directory of the site
+        config: the name of the favicon configuration
+        parallel: the number of parallel jobs
+
+    Returns:
+        The measures of the build
+    """
+    # shared memory is updated by the forked writers of parallel builds
+    page_time = multiprocessing.Value("d", 0.0)
+    page_count = multiprocessing.Value("i", 0)
+    fs_calls = multiprocessing.Value("i", 0)
+    html_page_context = sphinx_favicon.html_page_context
+
+    def timed_html_page_context(*args):
+        # CPU time is not affected by the other processes of parallel builds
+        start = time.thread_time()
+        html_page_context(*args)
+        with page_time.get_lock():
+            page_time.value += time.thread_time() - start
+            page_count.value += 1
+
+    def counted(method):
+        def wrapper(path, *args, **kwargs):
+            module = sys._getframe(1).f_globals.get("__name__", "")
+            if module.partition(".")[0] == "sphinx_favicon":
+                with fs_calls.get_lock():
+                    fs_calls.value += 1
+            return method(path, *args, **kwargs)
+
+        return wrapper
+
+    confoverrides = {"favicons": CONFIGS[config]} if CONFIGS[config] else {}
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(sphinx_favicon, "html_page_context", timed_html_page_context)
+        mp.setattr(Path, "is_file", counted(Path.is_file))
+        mp.setattr(Path, "stat", counted(Path.stat))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        app = make_app(
+            "html", srcdir=srcdir, confoverrides=confoverrides, parallel=parallel
+        )
+        app.build()
+        wall_time = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # memory still held by the extension at the end of the build
+    package = Path(sphinx_favicon.__file__).parent
+    only_extension = tracemalloc.Filter(True, str(package / "*"))
+    retained = sum(
+        stat.size
+        for stat in snapshot.filter_traces([only_extension]).statistics("filename")
+    )
+    return {
+        "wall_time": wall_time,
+        "page_time": page_time.value / max(page_count.value, 1),
+        "pages": page_count.value,
+        "peak_memory": peak,
+        "retained_memory": retained,
+        "fs_calls": fs_calls.value,
+    }
+
+
+@pytest.mark.parametrize("parallel", [1, 4])
+@pytest.mark.parametrize("config", list(CONFIGS))
+def test_scaling(make_app, rootdir, tmp_path, network_calls, config, parallel):
+    """Check that the cost of the extension per page doesn't grow with the site.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        tmp_path: a temporary directory
+        network_calls: the urls requested during the build
+        config: the name of the favicon configuration
+        parallel: the number of parallel jobs
+    """
+    results = {}
+    for pages in sorted(PAGES):
+        srcdir = tmp_path / f"site{pages}"
+        shutil.copytree(rootdir / "test-large_site", srcdir)
+        _generate_site(srcdir, pages)
+
+        network_calls.clear()
+        results[pages] = _measure(make_app, srcdir, config, parallel)
+        results[pages]["network_calls"] = len(network_calls)
+
+    with open(sys.__stdout__.fileno(), "w", closefd=False) as out:
+        out.write(f"\n[{config}, -j {parallel}]\n")
+        for pages, r in results.items():
+            out.write(
+                f"  {pages:>7} pages: {r['wall_time']:8.2f}s wall, "
+                f"{r['page_time'] * 1e6:7.1f}us/page, "
+                f"{r['peak_memory'] / 2**20:8.1f}MiB peak, "
+                f"{r['retained_memory'] / 2**10:7.1f}KiB retained, "
+                f"{r['fs_calls']} fs calls, {r['network_calls']} network calls\n"
+            )
+
+    small, large = results[min(PAGES)], results[max(PAGES)]
+
+    # the favicons are resolved once, whatever the number of pages
+    assert large["fs_calls"] == small["fs_calls"]
+    assert large["network_calls"] == small["network_calls"]
+
+    # the cost of a page doesn't depend on the size of the site (with a margin for noise)
+    assert large["page_time"] <= 3 * small["page_time"] + 50e-6
+    assert large["retained_memory"] <= 2 * small["retained_memory"] + 64 * 2**10
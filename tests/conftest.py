@@ -15,12 +15,19 @@ def rootdir() -> Path:
     return Path(__file__).resolve().parent / "roots"
 
 
+@pytest.fixture()
+def network_calls():
+    """The urls requested by the extension during the test."""
+    return []
+
+
 @pytest.fixture(autouse=True)
-def _stub_network_for_images(monkeypatch):
-    """Stub sphinx_favicon.requests.get to avoid network access during tests.
+def _stub_network_for_images(monkeypatch, network_calls):
+    """Stub the favicon HTTP session to avoid network access during tests.
 
     Returns minimal GIF bytes with the requested dimensions parsed from the URL
     (e.g., "...16x16..." -> 16x16). Defaults to 16x16 if not found.
+    Every requested url is recorded in ``network_calls``.
     """
 
     def _gif_bytes(w: int, h: int) -> bytes:
@@ -32,7 +39,8 @@ def _stub_network_for_images(monkeypatch):
             + b"\x00\x00\x00"
         )
 
-    def fake_get(url: str, *args, **kwargs):
+    def fake_get(session, url: str, *args, **kwargs):
+        network_calls.append(url)
         m = re.search(r"(\d+)x(\d+)", url)
         if m:
             w, h = int(m.group(1)), int(m.group(2))
@@ -40,13 +48,29 @@ def _stub_network_for_images(monkeypatch):
             # Sensible default for URLs without size hint; tests don't assert these sizes
             w, h = 16, 16
 
+        etag = f'"{w}x{h}"'
+
         class _Resp:
             status_code = 200
             content = _gif_bytes(w, h)
 
+            def __init__(self):
+                self.headers = {"ETag": etag}
+
+            def iter_content(self, chunk_size=1):
+                for i in range(0, len(self.content), chunk_size):
+                    yield self.content[i : i + chunk_size]
+
+            def close(self):
+                pass
+
+        # honour conditional requests like a real server would
+        if (kwargs.get("headers") or {}).get("If-None-Match") == etag:
+            _Resp.status_code, _Resp.content = 304, b""
+
         return _Resp()
 
-    monkeypatch.setattr("sphinx_favicon.requests.get", fake_get)
+    monkeypatch.setattr("requests.Session.get", fake_get)
 
 
 @pytest.fixture()
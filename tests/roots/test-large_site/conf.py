@@ -0,0 +1,14 @@
+extensions = ["sphinx_favicon"]
+
+root_doc = "index"
+exclude_patterns = ["_build"]
+
+html_theme = "basic"
+html_static_path = ["gfx"]
+
+favicons = [
+    "mstile-150x150.png",
+    {"rel": "icon", "href": "square.svg"},
+    "https://secure.example.com/favicon/favicon-32x32.png",
+    {"name": "theme-color", "content": "#ffffff"},
+]
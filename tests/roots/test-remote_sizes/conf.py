@@ -0,0 +1,11 @@
+extensions = ["sphinx_favicon"]
+
+root_doc = "index"
+exclude_patterns = ["_build"]
+
+html_theme = "basic"
+
+favicons = [
+    "https://secure.example.com/favicon/favicon-16x16.gif",
+    "https://secure.example.com/favicon/favicon-32x32.png",
+]
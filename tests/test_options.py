@@ -1,9 +1,46 @@
 """Test suite for the sphinx-favicon extension."""
 
+import dataclasses
+import gzip
+import json
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import zlib
 from itertools import chain
 from pathlib import Path
+from urllib.parse import unquote
+from xml.etree import ElementTree
 
 import pytest
+import requests
+
+import sphinx_favicon
+
+from .conftest import _favicon_tags, _link_tags, _meta_tags
+
+
+def _fresh_app(make_app, rootdir, tempdir, testroot, **kwargs):
+    """Create an application on a private copy of a test root.
+
+    The application is created inside the test so that the network stubs set in
+    the test are used at ``builder-inited``.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        tempdir: the temporary directory of the builds
+        testroot: the name of the test root
+        kwargs: extra parameters of the application
+    """
+    srcdir = Path(tempfile.mkdtemp(dir=tempdir)) / testroot
+    shutil.copytree(rootdir / f"test-{testroot}", srcdir)
+    return make_app("html", srcdir=srcdir, **kwargs)
 
 
 @pytest.mark.sphinx("html", testroot="list_of_three_dicts")
@@ -143,6 +180,9 @@ def test_static_files(app, favicon_tags, favicon_tags_for_nested):
     assert (static / "nested/triangle.svg").exists()
     assert (static / "circle.svg").exists()
 
+    # one block is rendered per page depth
+    assert set(app.env.favicons_rendered) == {"_static", "../_static"}
+
 
 @pytest.mark.sphinx("html", testroot="href_and_static")
 def test_href_and_static(app, favicon_tags, favicon_tags_for_nested):
@@ -195,3 +235,1258 @@ def test_msapp_meta(favicon_tags, meta_tags):
     assert "#2d89ef" in tag_values
     assert "theme-color" in tag_values
     assert "#ffffff" in tag_values
+
+
+@pytest.mark.sphinx("html", testroot="remote_sizes", srcdir="remote_sizes_once")
+def test_remote_sizes_resolved_once(
+    favicon_tags, favicon_tags_for_nested, network_calls
+):
+    """Check that remote sizes are computed once for the whole build.
+
+    Args:
+        favicon_tags: Favicon tags in index.html page.
+        favicon_tags_for_nested: Favicon tags in nested/page.html page.
+        network_calls: the urls requested during the build
+    """
+    # each favicon should be fetched once, regardless of the number of pages
+    assert len(network_calls) == 2
+    assert len(set(network_calls)) == 2
+
+    for tags in (favicon_tags, favicon_tags_for_nested):
+        assert [tag["sizes"] for tag in tags] == ["16x16", "32x32"]
+
+
+@pytest.mark.sphinx("html", testroot="remote_sizes", srcdir="remote_sizes_cache")
+def test_remote_sizes_cache(app, make_app, network_calls):
+    """Check that a warm rebuild reads the remote sizes from the cache.
+
+    Args:
+        app: the Sphinx application
+        make_app: factory of Sphinx applications
+        network_calls: the urls requested during the build
+    """
+    app.build()
+    assert len(network_calls) == 2
+    assert (Path(app.doctreedir) / "favicons_cache.json").is_file()
+
+    network_calls.clear()
+    rebuilt = make_app("html", srcdir=app.srcdir)
+    rebuilt.build()
+    assert network_calls == []
+    assert [tag["sizes"] for tag in _favicon_tags(rebuilt)] == ["16x16", "32x32"]
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="remote_sizes",
+    srcdir="remote_sizes_revalidate",
+    confoverrides={"favicons_cache_ttl": 0},
+)
+def test_remote_sizes_cache_revalidation(app, make_app, network_calls):
+    """Check that outdated entries are revalidated with conditional requests.
+
+    Args:
+        app: the Sphinx application
+        make_app: factory of Sphinx applications
+        network_calls: the urls requested during the build
+    """
+    app.build()
+    network_calls.clear()
+
+    # the stub server answers "304 Not Modified", sizes come from the cache
+    rebuilt = make_app(
+        "html", srcdir=app.srcdir, confoverrides={"favicons_cache_ttl": 0}
+    )
+    rebuilt.build()
+    assert len(network_calls) == 2
+    assert [tag["sizes"] for tag in _favicon_tags(rebuilt)] == ["16x16", "32x32"]
+
+
+def test_remote_sizes_session(make_app, monkeypatch, rootdir, sphinx_test_tempdir):
+    """Check that remote favicons share one session closed at the end of the build.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    sessions = []
+    stub_get = requests.Session.get
+
+    def recording_get(session, url, **kwargs):
+        sessions.append(session)
+        return stub_get(session, url, **kwargs)
+
+    monkeypatch.setattr("requests.Session.get", recording_get)
+
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "remote_sizes")
+    assert len(sessions) == 2
+    assert sessions[0] is sessions[1]
+
+    app.build()
+    assert sphinx_favicon.network._session is None
+
+
+def test_remote_sizes_prefetch(make_app, monkeypatch, rootdir, sphinx_test_tempdir):
+    """Check that remote favicons are fetched concurrently at build start.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    # both requests need to be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    stub_get = requests.Session.get
+
+    def concurrent_get(session, url, **kwargs):
+        barrier.wait()
+        return stub_get(session, url, **kwargs)
+
+    monkeypatch.setattr("requests.Session.get", concurrent_get)
+
+    # the first request to a host is sent alone, use two hosts
+    favicons = [
+        "https://secure.example.com/favicon/favicon-16x16.gif",
+        "https://cdn.example.com/favicon/favicon-32x32.png",
+    ]
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "remote_sizes",
+        confoverrides={"favicons": favicons},
+    )
+    app.build()
+
+    assert [tag["sizes"] for tag in _favicon_tags(app)] == ["16x16", "32x32"]
+
+
+def test_remote_sizes_streaming(make_app, monkeypatch, rootdir, sphinx_test_tempdir):
+    """Check that only the header of a large remote image is read.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    png = Path(rootdir.parent.parent, "docs/source/_static/apple-touch-icon.png")
+    content = png.read_bytes() + b"\x00" * 10_000_000
+    read = []
+
+    class _Resp:
+        status_code = 200
+
+        def __init__(self):
+            self.headers = {}
+
+        def iter_content(self, chunk_size=1):
+            for i in range(0, len(content), chunk_size):
+                read.append(chunk_size)
+                yield content[i : i + chunk_size]
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr("requests.Session.get", lambda *args, **kwargs: _Resp())
+
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "remote_sizes")
+    app.build()
+
+    assert sum(read) <= 2 * sphinx_favicon.network.CHUNK_SIZE
+    assert [tag["sizes"] for tag in _favicon_tags(app)] == ["180x180", "180x180"]
+
+
+def test_remote_sizes_circuit_breaker(
+    make_app, monkeypatch, rootdir, sphinx_test_tempdir, network_calls
+):
+    """Check that a failing host is not requested anymore after a few failures.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+        network_calls: the urls requested during the build
+    """
+
+    def failing_get(session, url, **kwargs):
+        network_calls.append(url)
+        raise requests.ConnectionError(url)
+
+    monkeypatch.setattr("requests.Session.get", failing_get)
+
+    favicons = [f"https://down.example.com/favicon-{i}.png" for i in range(5)]
+    confoverrides = {"favicons": favicons, "favicons_http_max_failures": 2}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "remote_sizes",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    # the last favicons are skipped and summarized in a single warning
+    assert len(network_calls) == 2
+    warnings = app.warning.getvalue()
+    assert warnings.count("cannot be read") == 2
+    assert warnings.count("down.example.com failed 2 times") == 1
+    assert all("sizes" not in tag.attrs for tag in _favicon_tags(app))
+
+    # the circuit breakers of the build are closed once it is finished
+    assert sphinx_favicon.network._guard.blocked(favicons[0]) is None
+
+
+def test_remote_sizes_budget_outside_build(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the network budget of a build does not apply after it.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    link = "https://example.com/favicon.png"
+    confoverrides = {"favicons_network_budget": 0}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "remote_sizes",
+        confoverrides=confoverrides,
+    )
+    assert "is exhausted" in sphinx_favicon.network._guard.blocked(link)
+
+    app.build()
+    assert sphinx_favicon.network._guard.blocked(link) is None
+
+
+def test_remote_sizes_no_timeout_retry():
+    """Check that a request timeout is not retried beyond the network budget."""
+    sphinx_favicon._close_session()
+    retry = sphinx_favicon.network._get_session().get_adapter("https://").max_retries
+    sphinx_favicon._close_session()
+
+    assert retry.connect == 0
+    assert retry.read == 0
+    assert retry.total == sphinx_favicon.network._http_options["retries"]
+
+
+def test_offline(make_app, monkeypatch, rootdir, sphinx_test_tempdir, network_calls):
+    """Check that the offline mode never touches the network.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+        network_calls: the urls requested during the build
+    """
+    monkeypatch.setenv("SPHINX_FAVICON_OFFLINE", "1")
+    dimensions = {"https://secure.example.com/favicon/favicon-16x16.gif": "48x48"}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "remote_sizes",
+        confoverrides={"favicons_dimensions": dimensions},
+    )
+    app.build()
+
+    # the size is read from the manifest or skipped without warning
+    assert network_calls == []
+    assert "cannot be read" not in app.warning.getvalue()
+    tags = _favicon_tags(app)
+    assert tags[0]["sizes"] == "48x48"
+    assert "sizes" not in tags[1].attrs
+
+
+def test_offline_cache_fallback(make_app, rootdir, sphinx_test_tempdir, network_calls):
+    """Check that the offline mode serves the sizes from the persisted cache.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+        network_calls: the urls requested during the build
+    """
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "remote_sizes")
+    app.build()
+    network_calls.clear()
+
+    # even outdated entries are used when the network cannot be accessed
+    confoverrides = {"favicons_offline": True, "favicons_cache_ttl": 0}
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    assert network_calls == []
+    assert [tag["sizes"] for tag in _favicon_tags(rebuilt)] == ["16x16", "32x32"]
+
+
+def test_static_file_index(tmp_path, rootdir):
+    """Check that the dimensions of the static files follow their modifications.
+
+    Args:
+        tmp_path: a temporary directory
+        rootdir: the root directory of the test roots
+    """
+    images = Path(rootdir.parent.parent, "docs/source/_static")
+    static = tmp_path / "gfx"
+    static.mkdir()
+    icon = static / "icon.png"
+    icon.write_bytes((images / "apple-touch-icon.png").read_bytes())
+
+    index = sphinx_favicon.StaticFileIndex(["gfx"], tmp_path)
+    assert index.find("missing.png") is None
+    assert index.find("icon.png") == icon
+    assert index.dimensions(icon) == (180, 180)
+
+    # the edited file is measured again by the next build
+    icon.write_bytes((images / "favicon-16x16.png").read_bytes())
+    index = sphinx_favicon.StaticFileIndex(["gfx"], tmp_path)
+    assert index.dimensions(index.find("icon.png")) == (16, 16)
+
+
+def test_parallel_write(make_app, monkeypatch, rootdir, sphinx_test_tempdir, tmp_path):
+    """Check that parallel writers reuse the favicons resolved by the main process.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+        tmp_path: a temporary directory
+    """
+    # forked writers don't share memory with the test, record the requests in a file
+    requests_log = tmp_path / "requests.log"
+    stub_get = requests.Session.get
+
+    def logging_get(session, url, **kwargs):
+        with requests_log.open("a") as f:
+            f.write(f"{url}\n")
+        return stub_get(session, url, **kwargs)
+
+    monkeypatch.setattr("requests.Session.get", logging_get)
+
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "remote_sizes", parallel=3)
+    app.build()
+
+    assert len(requests_log.read_text().splitlines()) == 2
+    for page in ["index.html", "nested/page.html"]:
+        sizes = [tag["sizes"] for tag in _favicon_tags(app, page)]
+        assert sizes == ["16x16", "32x32"]
+
+
+def test_config_not_mutated(make_app, rootdir, sphinx_test_tempdir):
+    """Check that an unchanged config doesn't trigger a rebuild of the pages.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    app = _fresh_app(
+        make_app, rootdir, sphinx_test_tempdir, "list_of_three_icons_automated_values"
+    )
+    app.build()
+
+    # the user config is left untouched by the resolution of the favicons
+    assert app.config.favicons[1] == {
+        "href": "https://raw.githubusercontent.com/tcmetzger/sphinx-favicon/main/docs/source/_static/favicon-32x32.png",
+    }
+
+    pages = [Path(app.outdir, "index.html")]
+    mtimes = [page.stat().st_mtime_ns for page in pages]
+
+    rebuilt = make_app("html", srcdir=app.srcdir)
+    rebuilt.build()
+    assert "no targets are out of date" in rebuilt.status.getvalue()
+    assert [page.stat().st_mtime_ns for page in pages] == mtimes
+
+
+def test_compiled_favicon():
+    """Check the compilation and the rendering of a favicon."""
+    favicon = sphinx_favicon.Favicon.from_dict({"static-file": "icon.svg"})
+    assert favicon.tag == "link"
+    assert favicon.is_static
+    assert favicon.mime_type == "image/svg+xml"
+    assert sphinx_favicon.generate_meta(favicon, "../_static/icon.svg") == (
+        '    <link href="../_static/icon.svg" rel="icon" type="image/svg+xml">'
+    )
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        favicon.href = "other.svg"  # type: ignore[misc]
+
+    # attribute values are escaped
+    meta = {"name": "theme-color", "content": '"><script>'}
+    assert sphinx_favicon.generate_meta(meta) == (
+        '    <meta name="theme-color" content="&quot;&gt;&lt;script&gt;">'
+    )
+
+
+def test_lazy_imports(rootdir):
+    """Check that the HTTP stack is not imported for local favicons.
+
+    Sphinx itself imports ``requests`` for the linkcheck builder, the check is thus
+    made in a fresh interpreter without building.
+
+    Args:
+        rootdir: the root directory of the test roots
+    """
+    script = textwrap.dedent(f"""
+        import sys
+        from unittest.mock import MagicMock
+
+        import sphinx_favicon
+
+        sphinx_favicon.setup(MagicMock())
+        favicons = [{{"href": "square.svg"}}, {{"name": "theme-color", "content": "#fff"}}]
+        sphinx_favicon.resolve_favicons(favicons, ["gfx"], {str(rootdir / "test-static_files")!r})
+
+        assert "requests" not in sys.modules
+        assert "imagesize" not in sys.modules
+        """)
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+def test_aggregated_warnings(make_app, monkeypatch, rootdir, sphinx_test_tempdir):
+    """Check that each problem is reported once with the number of affected pages.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+
+    def no_shared_memory(*args, **kwargs):
+        raise OSError("sem_open is not available")
+
+    # serial builds work where multiprocessing cannot allocate shared memory
+    monkeypatch.setattr("multiprocessing.Value", no_shared_memory)
+    monkeypatch.setattr("multiprocessing.Array", no_shared_memory)
+
+    confoverrides = {
+        "favicons": ["missing.png", "square.svg"],
+        "favicons_report": True,
+    }
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    warnings = app.warning.getvalue().splitlines()
+    assert len([w for w in warnings if "missing.png" in w]) == 1
+    assert "(2 page(s) affected) [favicon.static]" in warnings[-1]
+
+    # no page is written by an incremental build without changes
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    warnings = rebuilt.warning.getvalue().splitlines()
+    assert "missing.png" in warnings[-1]
+    assert "page(s) affected" not in warnings[-1]
+
+
+def test_aggregated_warnings_parallel(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the pages written by forked writers are counted.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {"favicons": ["missing.png", "square.svg"]}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+        parallel=2,
+    )
+    app.build()
+
+    warnings = app.warning.getvalue().splitlines()
+    assert "(2 page(s) affected) [favicon.static]" in warnings[-1]
+
+
+def test_build_report(make_app, rootdir, sphinx_test_tempdir):
+    """Check the instrumentation report written at the end of the build.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "remote_sizes")
+    app.build()
+    assert not (Path(app.outdir) / sphinx_favicon.report.REPORT_FILE).exists()
+
+    confoverrides = {"favicons_report": True}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "remote_sizes",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    report = json.loads(
+        (Path(app.outdir) / sphinx_favicon.report.REPORT_FILE).read_text()
+    )
+    assert report["stages"]["normalize"]["count"] == 1
+    assert report["counters"]["remote_cache_miss"] == 2
+    assert len(report["fetches"]) == 2
+    assert {f["status"] for f in report["fetches"]} == {200}
+    assert all(f["bytes"] > 0 for f in report["fetches"])
+    assert report["pages"]["count"] == 2
+    assert "[sphinx-favicon] build report:" in app.status.getvalue()
+
+
+def _box(kind, payload):
+    """Build an ISOBMFF box.
+
+    Args:
+        kind: the type of the box
+        payload: the content of the box
+    """
+    return (8 + len(payload)).to_bytes(4, "big") + kind + payload
+
+
+_ICO = (
+    b"\x00\x00\x01\x00\x03\x00"
+    + b"\x20\x20" + b"\x00" * 14
+    + b"\x10\x10" + b"\x00" * 14
+    + b"\x00\x00" + b"\x00" * 14
+)  # fmt: skip
+
+_AVIF = _box(b"ftyp", b"avif" + b"\x00" * 4 + b"mif1") + _box(
+    b"meta",
+    b"\x00" * 4
+    + _box(b"hdlr", b"\x00" * 20)
+    + _box(
+        b"iprp",
+        _box(
+            b"ipco",
+            _box(b"ispe", b"\x00" * 4 + (64).to_bytes(4, "big") * 2)
+            + _box(b"ispe", b"\x00" * 4 + (8).to_bytes(4, "big") * 2),
+        ),
+    ),
+)
+
+
+@pytest.mark.parametrize(
+    ("data", "sizes"),
+    [
+        (_ICO, "16x16 32x32 256x256"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 7 + b"\x9d\x01\x2a\x30\x00\x18\x00", "48x24"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f\x1f\xc0\x07\x00", "32x32"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 8 + b"\xff\x00\x00\x7f\x00\x00", "256x128"),
+        (_AVIF, "64x64"),
+        (b'<?xml version="1.0"?>\n<svg xmlns="x" viewBox="0 0 1 1">', "any"),
+        (b'<svg stroke-width="2" width="48px" height="48">', "48x48"),
+        (b"<svg xmlns='x'", None),
+        (_ICO[:20], None),
+    ],
+)  # fmt: skip
+def test_header_sizes(data, sizes):
+    """Check the sizes decoded from the beginning of the image files.
+
+    Args:
+        data: the beginning of the image file
+        sizes: the expected sizes attribute
+    """
+    assert sphinx_favicon.images._header_sizes(data) == sizes
+
+
+def test_header_sizes_static_files(tmp_path):
+    """Check the sizes of the static files without a size in their header.
+
+    Args:
+        tmp_path: a temporary directory
+    """
+    (tmp_path / "gfx").mkdir()
+    (tmp_path / "gfx/favicon.ico").write_bytes(_ICO + b"\x00" * 1000)
+    (tmp_path / "gfx/logo.svg").write_text('<svg viewBox="0 0 1 1"></svg>')
+
+    favicons = ["favicon.ico", "logo.svg", {"href": "logo.svg", "sizes": "16x16"}]
+    resolved = sphinx_favicon.resolve_favicons(favicons, ["gfx"], tmp_path)
+
+    assert [dict(f.attributes)["sizes"] for f in resolved] == [
+        "16x16 32x32 256x256",
+        "any",
+        "16x16",
+    ]
+    assert resolved[0].mime_type == "image/x-icon"
+    assert (
+        sphinx_favicon.Favicon.from_dict({"href": "a.webp"}).mime_type == "image/webp"
+    )
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="remote_sizes",
+    srcdir="remote_sizes_vendor",
+    confoverrides={"favicons_vendor_remote": True},
+)
+def test_vendor_remote(app, make_app, network_calls):
+    """Check that remote favicons are served from the output static folder.
+
+    Args:
+        app: the Sphinx application
+        make_app: factory of Sphinx applications
+        network_calls: the urls requested during the build
+    """
+    app.build()
+    assert len(network_calls) == 2
+
+    tags = _favicon_tags(app)
+    assert [tag["sizes"] for tag in tags] == ["16x16", "32x32"]
+    for tag, extension in zip(tags, ["gif", "png"]):
+        assert tag["href"].startswith("_static/favicons/")
+        assert tag["href"].endswith(f".{extension}")
+        assert (Path(app.outdir) / tag["href"]).is_file()
+
+    nested = _favicon_tags(app, "nested/page.html")
+    assert [tag["href"] for tag in nested] == [f"../{tag['href']}" for tag in tags]
+
+    # the downloaded files are reused by the next builds
+    network_calls.clear()
+    rebuilt = make_app(
+        "html", srcdir=app.srcdir, confoverrides={"favicons_vendor_remote": True}
+    )
+    rebuilt.build()
+    assert network_calls == []
+    assert _favicon_tags(rebuilt) == tags
+
+
+def test_fingerprint(make_app, monkeypatch, rootdir, sphinx_test_tempdir):
+    """Check that static favicons are served under content-hashed file names.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    hashed = []
+    file_digest = sphinx_favicon.fingerprint._file_digest
+    monkeypatch.setattr(
+        sphinx_favicon.fingerprint,
+        "_file_digest",
+        lambda p: hashed.append(p) or file_digest(p),
+    )
+
+    confoverrides = {"favicons_fingerprint": True}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+    assert len(hashed) == 3
+
+    tags = _favicon_tags(app)
+    for tag, name in zip(tags, ["square", "nested/triangle", "circle"]):
+        assert re.fullmatch(rf"_static/{name}\.[0-9a-f]{{16}}\.svg", tag["href"])
+        source = Path(app.srcdir, "gfx", f"{name}.svg")
+        assert Path(app.outdir, tag["href"]).read_bytes() == source.read_bytes()
+
+    nested = _favicon_tags(app, "nested/page.html")
+    assert [tag["href"] for tag in nested] == [f"../{tag['href']}" for tag in tags]
+
+    # unchanged files are not hashed again by the next builds, even in a new process
+    monkeypatch.setattr(sphinx_favicon.StaticFileIndex, "_stamped", {})
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    assert len(hashed) == 3
+    assert _favicon_tags(rebuilt) == tags
+    assert Path(rebuilt.doctreedir, sphinx_favicon.FILES_CACHE).is_file()
+
+    # a modified file is hashed again
+    source = Path(app.srcdir, "gfx", "circle.svg")
+    source.write_text(source.read_text().replace("</svg>", "<g/></svg>"))
+    modified = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    modified.build()
+    assert hashed[3:] == [source]
+
+
+def test_generate(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the favicon set is generated from a master image.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    image = pytest.importorskip("PIL.Image")
+    confoverrides = {
+        "favicons": [{"name": "theme-color", "content": "#ffffff"}],
+        "favicons_generate": "mstile-150x150.png",
+        "favicons_report": True,
+    }
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "msapp_meta",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    tags = _favicon_tags(app)
+    assert [tag["sizes"] for tag in tags] == [
+        "16x16 32x32 48x48",
+        "16x16",
+        "32x32",
+        "180x180",
+        "192x192",
+        "512x512",
+    ]
+    assert tags[0]["type"] == "image/x-icon"
+    assert tags[3]["rel"] == ["apple-touch-icon"]
+    assert {"name": "theme-color", "content": "#ffffff"} in [
+        tag.attrs for tag in _meta_tags(app, "index.html")
+    ]
+    for tag in tags:
+        icon = Path(app.outdir, tag["href"]).read_bytes()
+        assert sphinx_favicon.images._header_sizes(icon) == tag["sizes"]
+
+    # the generated images are reused by the next builds
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    report = json.loads(
+        (Path(app.outdir) / sphinx_favicon.report.REPORT_FILE).read_text()
+    )
+    assert report["counters"]["generate_cache_hit"] == len(tags)
+    assert "generate_cache_miss" not in report["counters"]
+    assert _favicon_tags(rebuilt) == tags
+
+    # the images of a previous master are removed
+    folder = Path(app.doctreedir, sphinx_favicon.GENERATED_CACHE, "favicons")
+    master = Path(app.srcdir, "gfx", "mstile-150x150.png")
+    with image.open(master) as original:
+        original.rotate(90).save(master)
+    modified = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    modified.build()
+    files = [f"_static/favicons/{f.name}" for f in folder.iterdir()]
+    assert len(files) == len(tags)
+    assert set(files).isdisjoint(tag["href"] for tag in tags)
+
+
+def test_generate_tile(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the generated tile is only listed in the browserconfig file.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    pytest.importorskip("PIL")
+    confoverrides = {
+        "favicons": [],
+        "favicons_generate": "mstile-150x150.png",
+        "favicons_manifest": True,
+    }
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "msapp_meta",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    assert "150x150" not in [tag.get("sizes") for tag in _favicon_tags(app)]
+    browserconfig = ElementTree.parse(Path(app.outdir, "browserconfig.xml"))
+    src = browserconfig.find("msapplication/tile/square150x150logo").get("src")
+    assert re.fullmatch(r"_static/favicons/mstile-150x150\.[0-9a-f]{16}\.png", src)
+    assert Path(app.outdir, src).is_file()
+
+
+def test_generate_failure(make_app, rootdir, sphinx_test_tempdir):
+    """Check that a master image that cannot be rendered does not fail the build.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    pytest.importorskip("PIL")
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "msapp_meta",
+        confoverrides={"favicons": [], "favicons_generate": "bomb.png"},
+    )
+    # a PNG header declaring more pixels than Pillow accepts to decode
+    header = struct.pack(">IIBBBBB", 30000, 30000, 8, 6, 0, 0, 0)
+    chunk = b"IHDR" + header
+    crc = struct.pack(">I", zlib.crc32(chunk))
+    bomb = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(header)) + chunk + crc
+    Path(app.srcdir, "gfx", "bomb.png").write_bytes(bomb)
+    confoverrides = {"favicons": [], "favicons_generate": "bomb.png"}
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+
+    assert _favicon_tags(rebuilt) == []
+    warnings = rebuilt.warning.getvalue()
+    assert warnings.count("The favicons cannot be generated from bomb.png") == 1
+
+
+def test_inline_svg(make_app, rootdir, sphinx_test_tempdir, monkeypatch):
+    """Check that small SVG favicons are inlined as data URIs.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+        monkeypatch: fixture to reset the in-memory cache of the files
+    """
+    confoverrides = {"favicons_inline_svg": 200, "favicons_report": True}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    tags = _favicon_tags(app)
+    nested = _favicon_tags(app, "nested/page.html")
+    assert tags[0]["href"] == nested[0]["href"]
+    assert tags[0]["href"] == (
+        "data:image/svg+xml,%3Csvg viewBox=%220 0 1 1%22 "
+        "xmlns=%22http://www.w3.org/2000/svg%22%3E"
+        "%3Crect width=%221%22 height=%221%22 /%3E%3C/svg%3E"
+    )
+    assert ElementTree.fromstring(unquote(tags[0]["href"].split(",", 1)[1]))
+    assert tags[0]["sizes"] == "32x32"
+
+    # larger files are still linked
+    assert [tag["href"] for tag in tags[1:]] == [
+        "_static/nested/triangle.svg",
+        "_static/circle.svg",
+    ]
+
+    # the URIs of unchanged files are not computed again, even in a new process
+    monkeypatch.setattr(sphinx_favicon.StaticFileIndex, "_stamped", {})
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    report = json.loads(
+        (Path(app.outdir) / sphinx_favicon.report.REPORT_FILE).read_text()
+    )
+    assert report["counters"]["svg_data_cache_hit"] == 3
+    assert "svg_data_cache_miss" not in report["counters"]
+
+
+LATIN_SVG = (
+    '<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1 1">'
+    "<title>Cercle bleu \u00e9t\u00e9</title>"
+    '<circle cx="0.5" cy="0.5" r="0.5"/></svg>\n'
+).encode("iso-8859-1")
+"SVG favicon using the encoding of its XML declaration"
+
+
+def test_inline_svg_encoding(make_app, rootdir, sphinx_test_tempdir, monkeypatch):
+    """Check that SVG files are decoded with the encoding they declare.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+        monkeypatch: fixture to reset the in-memory cache of the files
+    """
+    confoverrides = {"favicons_inline_svg": 1000}
+
+    def build(content):
+        app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "static_files")
+        (Path(app.srcdir) / "gfx" / "circle.svg").write_bytes(content)
+        monkeypatch.setattr(sphinx_favicon.StaticFileIndex, "_stamped", {})
+        app = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+        app.build()
+        return app
+
+    app = build(LATIN_SVG)
+    svg = unquote(_favicon_tags(app)[2]["href"].split(",", 1)[1])
+    assert "<title>Cercle bleu \u00e9t\u00e9</title>" in svg
+    assert ElementTree.fromstring(svg.encode("utf-8"))
+
+    # a file that does not match its encoding stays linked
+    app = build(LATIN_SVG.replace(b"ISO-8859-1", b"UTF-8"))
+    assert _favicon_tags(app)[2]["href"] == "_static/circle.svg"
+    assert "(circle.svg) cannot be minified" in app.warning.getvalue()
+
+
+ENTITIES_SVG = b"""<?xml version="1.0" encoding="utf-8"?>
+<!-- Generator: Adobe Illustrator 27.0.0, SVG Export Plug-In -->
+<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"
+  "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd" [
+  <!ENTITY ns_svg "http://www.w3.org/2000/svg">
+  <!ENTITY ns_xlink "http://www.w3.org/1999/xlink">
+]>
+<svg version="1.1" xmlns="&ns_svg;" xmlns:xlink="&ns_xlink;" viewBox="0 0 1 1">
+  <circle cx="0.5" cy="0.5" r="0.5"/>
+</svg>
+"""
+"SVG favicon declaring entities in the internal subset of its doctype"
+
+
+def test_inline_svg_doctype(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the entities declared by the doctype of a SVG file are kept.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {"favicons_inline_svg": 1000}
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "static_files")
+    (Path(app.srcdir) / "gfx" / "circle.svg").write_bytes(ENTITIES_SVG)
+    app = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    app.build()
+
+    svg = unquote(_favicon_tags(app)[2]["href"].split(",", 1)[1])
+    assert svg.startswith("<!DOCTYPE svg PUBLIC")
+    assert "Illustrator" not in svg
+    root = ElementTree.fromstring(svg)
+    assert root.tag == "{http://www.w3.org/2000/svg}svg"
+
+
+def test_optimize(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the favicon files of the output are optimized and precompressed.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {"favicons_optimize": True, "favicons_report": True}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    for name in ["square.svg", "nested/triangle.svg", "circle.svg"]:
+        source = Path(app.srcdir, "gfx", name).read_bytes()
+        output = Path(app.outdir, "_static", name).read_bytes()
+        assert len(output) < len(source)
+        assert not output.startswith(b"<?xml")
+        assert ElementTree.fromstring(output)
+
+    # compressed siblings are only written when they are smaller
+    static = Path(app.outdir, "_static")
+    assert not (static / "square.svg.gz").exists()
+    compressed = (static / "circle.svg.gz").read_bytes()
+    assert gzip.decompress(compressed) == (static / "circle.svg").read_bytes()
+
+    # unchanged favicons are not processed again
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    report = json.loads(
+        (Path(app.outdir) / sphinx_favicon.report.REPORT_FILE).read_text()
+    )
+    assert report["counters"]["optimize_cache_hit"] == 3
+    assert "optimize_cache_miss" not in report["counters"]
+
+
+def test_optimize_png(make_app, rootdir, sphinx_test_tempdir):
+    """Check that PNG favicons are recompressed without loss.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    image = pytest.importorskip("PIL.Image")
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "msapp_meta",
+        confoverrides={"favicons_optimize": True},
+    )
+    app.build()
+
+    source = Path(app.srcdir, "gfx", "mstile-150x150.png")
+    output = Path(app.outdir, "_static", "mstile-150x150.png")
+    assert output.stat().st_size <= source.stat().st_size
+    with image.open(source) as original, image.open(output) as optimized:
+        assert optimized.mode == original.mode
+        assert optimized.tobytes() == original.tobytes()
+    assert not output.with_name(f"{output.name}.gz").exists()
+
+
+def test_optimize_unreadable(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the favicons are optimized whatever their encoding or content.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    pytest.importorskip("PIL.Image")
+    confoverrides = {
+        "favicons": ["circle.svg", "broken.png"],
+        "favicons_optimize": True,
+    }
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "static_files")
+    (Path(app.srcdir) / "gfx" / "circle.svg").write_bytes(LATIN_SVG)
+    broken = b"<svg/> mislabelled as a PNG image"
+    (Path(app.srcdir) / "gfx" / "broken.png").write_bytes(broken)
+    app = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    app.build()
+
+    # the minified image is written in UTF-8, the default encoding of XML
+    output = Path(app.outdir, "_static", "circle.svg").read_bytes()
+    assert len(output) < len(LATIN_SVG)
+    title = ElementTree.fromstring(output).find("{http://www.w3.org/2000/svg}title")
+    assert title is not None
+    assert title.text == "Cercle bleu \u00e9t\u00e9"
+
+    # the files that cannot be read are kept as is
+    assert Path(app.outdir, "_static", "broken.png").read_bytes() == broken
+    assert "(broken.png) cannot be read" in app.warning.getvalue()
+
+
+def test_optimize_svg_doctype(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the optimized SVG favicons are still well-formed XML.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {
+        "favicons": ["circle.svg", "square.svg"],
+        "favicons_optimize": True,
+    }
+    app = _fresh_app(make_app, rootdir, sphinx_test_tempdir, "static_files")
+    (Path(app.srcdir) / "gfx" / "circle.svg").write_bytes(ENTITIES_SVG)
+    malformed = b"<svg xmlns='http://www.w3.org/2000/svg'>\n  <g>\n</svg>\n"
+    (Path(app.srcdir) / "gfx" / "square.svg").write_bytes(malformed)
+    app = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    app.build()
+
+    output = Path(app.outdir, "_static", "circle.svg").read_bytes()
+    assert len(output) < len(ENTITIES_SVG)
+    assert b"<!ENTITY ns_svg" in output
+    assert ElementTree.fromstring(output).tag == "{http://www.w3.org/2000/svg}svg"
+
+    # a file that would not be well-formed once minified is kept as is
+    assert Path(app.outdir, "_static", "square.svg").read_bytes() == malformed
+    assert "(square.svg) cannot be read" in app.warning.getvalue()
+
+
+def test_optimize_fingerprint(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the fingerprint of an optimized favicon is the hash of its content.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {"favicons_fingerprint": True, "favicons_optimize": True}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    tags = _favicon_tags(app)
+    for tag, name in zip(tags, ["square", "nested/triangle", "circle"]):
+        output = Path(app.outdir, tag["href"]).read_bytes()
+        source = Path(app.srcdir, "gfx", f"{name}.svg").read_bytes()
+        assert len(output) < len(source)
+        digest = re.fullmatch(rf"_static/{name}\.([0-9a-f]{{16}})\.svg", tag["href"])
+        assert digest is not None
+        assert digest.group(1) == sphinx_favicon.images._digest(output)
+
+
+def test_optimize_installed(make_app, monkeypatch, rootdir, sphinx_test_tempdir):
+    """Check that the favicons cached before Pillow is installed are optimized again.
+
+    Args:
+        make_app: factory of Sphinx applications
+        monkeypatch: the pytest monkeypatch fixture
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    pytest.importorskip("PIL.Image")
+    confoverrides = {"favicons_optimize": True}
+    with monkeypatch.context() as patch:
+        patch.setitem(sys.modules, "PIL", None)
+        app = _fresh_app(
+            make_app,
+            rootdir,
+            sphinx_test_tempdir,
+            "msapp_meta",
+            confoverrides=confoverrides,
+        )
+        app.build()
+
+    source = Path(app.srcdir, "gfx", "mstile-150x150.png")
+    output = Path(app.outdir, "_static", "mstile-150x150.png")
+    assert output.read_bytes() == source.read_bytes()
+
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    assert output.stat().st_size < source.stat().st_size
+
+
+def test_manifest(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the large icons and tiles are moved out of the pages.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {
+        "project": "Favicons",
+        "favicons": [
+            "https://secure.example.com/favicon/favicon-16x16.gif",
+            "mstile-150x150.png",
+            {"name": "msapplication-TileColor", "content": "#2d89ef"},
+            {"name": "theme-color", "content": "#ffffff"},
+        ],
+        "favicons_manifest": True,
+    }
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "msapp_meta",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    tags = _favicon_tags(app)
+    assert [tag["href"] for tag in tags] == [
+        "https://secure.example.com/favicon/favicon-16x16.gif"
+    ]
+    links = [
+        t["href"] for t in _link_tags(app, "index.html") if t["rel"] == ["manifest"]
+    ]
+    assert links == ["_static/site.webmanifest"]
+    metas = [tag.get("name") for tag in _meta_tags(app, "index.html")]
+    assert "theme-color" in metas
+    assert "msapplication-TileColor" not in metas
+    config = [
+        m
+        for m in _meta_tags(app, "index.html")
+        if m.get("name") == "msapplication-config"
+    ]
+    assert [m["content"] for m in config] == ["browserconfig.xml"]
+
+    manifest = json.loads(Path(app.outdir, "_static/site.webmanifest").read_text())
+    assert manifest == {
+        "name": "Favicons",
+        "icons": [
+            {"src": "mstile-150x150.png", "sizes": "150x150", "type": "image/png"}
+        ],
+        "theme_color": "#ffffff",
+    }
+
+    browserconfig = ElementTree.parse(Path(app.outdir, "browserconfig.xml"))
+    tile = browserconfig.find("msapplication/tile")
+    assert tile.find("square150x150logo").get("src") == "_static/mstile-150x150.png"
+    assert tile.find("TileColor").text == "#2d89ef"
+
+
+def test_manifest_tile_image(make_app, rootdir, sphinx_test_tempdir):
+    """Check that the pages of any folder link to the tiles of the site.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {
+        "favicons": [
+            "circle.svg",
+            {"name": "msapplication-TileImage", "content": "_static/mstile.png"},
+        ],
+        "favicons_manifest": True,
+    }
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+
+    # the content is relative to the root of the output, like in the root pages
+    browserconfig = ElementTree.parse(Path(app.outdir, "browserconfig.xml"))
+    src = browserconfig.find("msapplication/tile/square150x150logo").get("src")
+    assert src == "_static/mstile.png"
+
+    for page, href in [
+        ("index.html", "browserconfig.xml"),
+        ("nested/page.html", "../browserconfig.xml"),
+    ]:
+        metas = {m.get("name"): m.get("content") for m in _meta_tags(app, page)}
+        assert "msapplication-TileImage" not in metas
+        assert metas["msapplication-config"] == href
+
+
+def test_patch_html(make_app, rootdir, sphinx_test_tempdir):
+    """Check that a favicon change patches the pages instead of writing them.
+
+    Args:
+        make_app: factory of Sphinx applications
+        rootdir: the root directory of the test roots
+        sphinx_test_tempdir: the temporary directory of the builds
+    """
+    confoverrides = {"favicons_patch_html": True}
+    app = _fresh_app(
+        make_app,
+        rootdir,
+        sphinx_test_tempdir,
+        "static_files",
+        confoverrides=confoverrides,
+    )
+    app.build()
+    assert len(_favicon_tags(app)) == 3
+    page = Path(app.outdir, "nested", "page.html").read_text()
+    assert page.count(sphinx_favicon.patch.FAVICONS_START) == 1
+
+    confoverrides["favicons"] = ["circle.svg"]
+    rebuilt = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rebuilt.build()
+    assert "no targets are out of date" in rebuilt._status.getvalue()
+
+    for name, prefix in [("index.html", ""), ("nested/page.html", "../")]:
+        tags = [t["href"] for t in _link_tags(rebuilt, name) if t["rel"] == ["icon"]]
+        assert tags == [f"{prefix}_static/circle.svg"]
+
+    patched = Path(rebuilt.outdir, "nested", "page.html").read_text()
+    start = page.index(sphinx_favicon.patch.FAVICONS_END)
+    assert patched.endswith(page[start:])
+
+    # a change outside the favicons still writes the pages
+    confoverrides["html_title"] = "Patched"
+    rewritten = make_app("html", srcdir=app.srcdir, confoverrides=confoverrides)
+    rewritten.build()
+    assert "no targets are out of date" not in rewritten._status.getvalue()